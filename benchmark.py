@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# 基准测试：在合成数据上逐阶段计时，与保存的基线比较
+# 每个规模在独立子进程中运行，峰值内存互不影响
+
+STAGES = ['ingest:character', 'ingest:person', 'ingest:subject', 'segment', 'split', 'pinyin', 'romaji', 'scale', 'sort_write']
+DEFAULT_SCALES = [1, 10, 50]
+# 运行时间超过基线 (1 + tolerance) 倍且多出 MIN_REGRESSION_SECONDS 以上才算退化
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+def count_lines(path):
+    n = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n += block.count(b'\n')
+    return n
+
+def load_data_tables(data_dir):
+    # 使用 generate_dump.py 写在数据目录中的附加数据表，而不是脚本目录下的，与真实构建的负载一致
+    import convert_to_rime_final as conv
+
+    tables = conv.load_side_tables(data_dir)
+    conv.replace_side_tables(tables)
+    return tables
+
+def run_stages(data_dir, json_backend='auto'):
+    import convert_to_rime_final as conv
+
+    conv.set_json_backend(json_backend)
+    tables = load_data_tables(data_dir)
+    results = []
+
+    def record(stage, start, items):
+        seconds = time.perf_counter() - start
+        results.append({
+            'stage': stage, 'seconds': round(seconds, 4), 'items': items,
+            'items_per_sec': round(items / seconds) if seconds > 0 else None,
+            'peak_rss_mb': conv.peak_rss_mb(),
+        })
+
+    outputs = {}
+    for dump in conv.DUMPS:
+        path = os.path.join(data_dir, dump + '.jsonlines')
+        n_records = count_lines(path)
+        start = time.perf_counter()
+        outputs[dump] = conv.aggregate_jsonlines(dump, path)
+        record('ingest:' + dump, start, n_records)
+
+    # 姓名切分：所有去重后的名字走一遍批量接口
+    names = list(dict.fromkeys(name for aggregates in outputs.values() for name in aggregates[0]))
+    conv.surname_trie()
+    start = time.perf_counter()
+    for _ in conv.segment_names(names):
+        pass
+    record('segment', start, len(names))
+    del names
+
+    # 分词：展开名字聚合并累加到 WeightTable（含日文翻译）
+    table = conv.WeightTable(conv.CHINESE_COLUMNS + conv.ENGLISH_COLUMNS)
+    start = time.perf_counter()
+    n_names = sum(len(names) for aggregates in outputs.values() for names in aggregates)
+    table.add('character', conv.iter_outputs('character', outputs['character'])[0])
+    table.add('person', conv.iter_outputs('person', outputs['person'])[0])
+    subject_cn, subject_en = conv.iter_outputs('subject', outputs['subject'])
+    table.add('subject_cn', subject_cn)
+    table.add('subject_en', subject_en)
+    translated_names = conv.translated_names(tables.jp_cn_translations)
+    table.add('translation', conv.iter_name_parts(translated_names))
+    record('split', start, n_names)
+    del outputs, translated_names
+
+    # 与 iter_dict_entries 相同：跳过空词
+    chinese = [(word, weight) for word, weight in table.totals(conv.CHINESE_COLUMNS) if word]
+    english = [(word, weight) for word, weight in table.totals(conv.ENGLISH_COLUMNS) if word]
+
+    # 拼音：不使用缓存，测量实际转换速度（pypinyin 的导入不计入）
+    conv.get_pinyin('拼音')
+    conv.PINYIN_CACHE.clear()
+    start = time.perf_counter()
+    codes = [conv.get_pinyin(word) for word, _ in chinese]
+    record('pinyin', start, len(chinese))
+
+    start = time.perf_counter()
+    kana_names = conv.load_kana_names(os.path.join(data_dir, 'names_splitted.txt'))
+    record('romaji', start, len(kana_names))
+
+    start = time.perf_counter()
+    chinese_weights = [conv.scale_weight(weight) for _, weight in chinese]
+    # 英文词的换算、收录阈值和编码与真实构建共用 english_entry
+    english_entries = [conv.english_entry(word, weight, conv.ENGLISH_THRESHOLD) for word, weight in english]
+    record('scale', start, len(chinese) + len(english))
+
+    entries = [(word, code, weight) for (word, _), code, weight in zip(chinese, codes, chinese_weights)]
+    entries += [entry for entry in english_entries if entry is not None]
+    entries += kana_names
+    entries += conv.KANA_ENTRIES
+    entries += conv.JP_KANJI_POLYPHONIC
+
+    with tempfile.TemporaryDirectory(prefix='bangumi_bench_') as tmp_dir:
+        start = time.perf_counter()
+        with open(os.path.join(tmp_dir, 'bangumi.dict.yaml'), 'w', encoding='utf-8', buffering=1 << 20) as f:
+            n_lines = conv.write_lines(f, conv.sort_entries(iter(entries)))
+        record('sort_write', start, n_lines)
+
+    return results
+
+def ensure_dataset(data_root, scale, seed):
+    import generate_dump
+
+    data_dir = os.path.join(data_root, f'{scale:g}x')
+    meta_path = os.path.join(data_dir, 'dataset.json')
+    meta = {'scale': scale, 'seed': seed}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('params') == meta:
+                return data_dir
+    print(f'Generating {scale:g}x dataset in {data_dir}...')
+    counts = generate_dump.generate(data_dir, scale, seed)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'params': meta, 'records': counts}, f)
+    return data_dir
+
+def run_scale(data_dir, json_backend):
+    # 在子进程中运行，避免各规模之间共享峰值内存和缓存
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', data_dir, '--json-backend', json_backend],
+        capture_output=True, text=True, encoding='utf-8')
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stdout + proc.stderr)
+        raise RuntimeError(f'benchmark worker failed on {data_dir}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def print_results(scale, results):
+    print(f'\n== {scale:g}x ==')
+    print(f"{'stage':<18}{'seconds':>10}{'items':>12}{'items/s':>12}{'peak MB':>10}")
+    for r in results:
+        rate = r['items_per_sec'] if r['items_per_sec'] is not None else '-'
+        peak = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else '-'
+        print(f"{r['stage']:<18}{r['seconds']:>10.3f}{r['items']:>12}{rate:>12}{peak:>10}")
+
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for scale, results in report.items():
+        base_stages = {r['stage']: r for r in baseline.get(scale, [])}
+        for r in results:
+            base = base_stages.get(r['stage'])
+            if base is None:
+                continue
+            limit = base['seconds'] * (1 + tolerance)
+            if r['seconds'] > limit and r['seconds'] - base['seconds'] > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{scale}x {r['stage']}: {r['seconds']:.3f}s "
+                                   f"(baseline {base['seconds']:.3f}s, limit {limit:.3f}s)")
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark convert_to_rime_final.py on synthetic Bangumi dumps')
+    parser.add_argument('--scale', type=float, action='append', default=None,
+                        help='dataset scale to run, may be repeated (default: 1, 10, 50)')
+    parser.add_argument('--data-dir', default='bench_data',
+                        help='where generated datasets are kept and reused (default: bench_data)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json-backend', default='auto', choices=['auto', 'orjson', 'json'])
+    parser.add_argument('--baseline', default='benchmark_baseline.json',
+                        help='stored baseline to compare against (default: benchmark_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write this run as the new baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown per stage before failing (default: 0.25 = 25%%)')
+    parser.add_argument('--output', default=None, help='also write the report as JSON to this file')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.worker:
+        print(json.dumps(run_stages(args.worker, args.json_backend)))
+        return 0
+
+    report = {}
+    for scale in args.scale or DEFAULT_SCALES:
+        data_dir = ensure_dataset(args.data_dir, scale, args.seed)
+        report[f'{scale:g}'] = run_scale(data_dir, args.json_backend)
+        print_results(scale, report[f'{scale:g}'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update(report)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'\nBaseline saved to: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'\nNo baseline at {args.baseline}; run with --save-baseline to create one')
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = find_regressions(report, baseline, args.tolerance)
+    if regressions:
+        print(f'\n{len(regressions)} stage(s) regressed more than {args.tolerance:.0%}:')
+        for line in regressions:
+            print('  ' + line)
+        return 1
+    print(f'\nNo regressions against {args.baseline}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,50 +1,106 @@
+import argparse
+import contextlib
+import datetime
+import hashlib
+import heapq
+import inspect
+import io
+import sys
 import json
+import mmap
 import re
 import os
-from pypinyin import lazy_pinyin, Style
-
-# 日语假名单字
-KANA_ENTRIES = [
-    ('あ', 'a', 1000), ('い', 'i', 1000), ('う', 'u', 1000), ('え', 'e', 1000), ('お', 'o', 1000),
-    ('か', 'ka', 1000), ('き', 'ki', 1000), ('く', 'ku', 1000), ('け', 'ke', 1000), ('こ', 'ko', 1000),
-    ('さ', 'sa', 1000), ('し', 'shi', 1000), ('す', 'su', 1000), ('せ', 'se', 1000), ('そ', 'so', 1000),
-    ('た', 'ta', 1000), ('ち', 'chi', 1000), ('つ', 'tsu', 1000), ('て', 'te', 1000), ('と', 'to', 1000),
-    ('な', 'na', 1000), ('に', 'ni', 1000), ('ぬ', 'nu', 1000), ('ね', 'ne', 1000), ('の', 'no', 1000),
-    ('は', 'ha', 1000), ('ひ', 'hi', 1000), ('ふ', 'fu', 1000), ('へ', 'he', 1000), ('ほ', 'ho', 1000),
-    ('ま', 'ma', 1000), ('み', 'mi', 1000), ('む', 'mu', 1000), ('め', 'me', 1000), ('も', 'mo', 1000),
-    ('や', 'ya', 1000), ('ゆ', 'yu', 1000), ('よ', 'yo', 1000),
-    ('ら', 'ra', 1000), ('り', 'ri', 1000), ('る', 'ru', 1000), ('れ', 're', 1000), ('ろ', 'ro', 1000),
-    ('わ', 'wa', 1000), ('を', 'wo', 1000), ('ん', 'n', 1000),
-    # 浊音
-    ('が', 'ga', 900), ('ぎ', 'gi', 900), ('ぐ', 'gu', 900), ('げ', 'ge', 900), ('ご', 'go', 900),
-    ('ざ', 'za', 900), ('じ', 'ji', 900), ('ず', 'zu', 900), ('ぜ', 'ze', 900), ('ぞ', 'zo', 900),
-    ('だ', 'da', 900), ('ぢ', 'di', 900), ('づ', 'du', 900), ('で', 'de', 900), ('ど', 'do', 900),
-    ('ば', 'ba', 900), ('び', 'bi', 900), ('ぶ', 'bu', 900), ('べ', 'be', 900), ('ぼ', 'bo', 900),
-    ('ぱ', 'pa', 900), ('ぴ', 'pi', 900), ('ぷ', 'pu', 900), ('ぺ', 'pe', 900), ('ぽ', 'po', 900),
-    # 拗音
-    ('きゃ', 'kya', 800), ('きゅ', 'kyu', 800), ('きょ', 'kyo', 800),
-    ('しゃ', 'sha', 800), ('しゅ', 'shu', 800), ('しょ', 'sho', 800),
-    ('ちゃ', 'cha', 800), ('ちゅ', 'chu', 800), ('ちょ', 'cho', 800),
-    ('にゃ', 'nya', 800), ('にゅ', 'nyu', 800), ('にょ', 'nyo', 800),
-    ('ひゃ', 'hya', 800), ('ひゅ', 'hyu', 800), ('ひょ', 'hyo', 800),
-    ('みゃ', 'mya', 800), ('みゅ', 'myu', 800), ('みょ', 'myo', 800),
-    ('りゃ', 'rya', 800), ('りゅ', 'ryu', 800), ('りょ', 'ryo', 800),
-    ('ぎゃ', 'gya', 800), ('ぎゅ', 'gyu', 800), ('ぎょ', 'gyo', 800),
-    ('じゃ', 'ja', 800), ('じゅ', 'ju', 800), ('じょ', 'jo', 800),
-    ('びゃ', 'bya', 800), ('びゅ', 'byu', 800), ('びょ', 'byo', 800),
-    ('ぴゃ', 'pya', 800), ('ぴゅ', 'pyu', 800), ('ぴょ', 'pyo', 800),
-    # 片假名
-    ('ア', 'a', 900), ('イ', 'i', 900), ('ウ', 'u', 900), ('エ', 'e', 900), ('オ', 'o', 900),
-    ('カ', 'ka', 900), ('キ', 'ki', 900), ('ク', 'ku', 900), ('ケ', 'ke', 900), ('コ', 'ko', 900),
-    ('サ', 'sa', 900), ('シ', 'shi', 900), ('ス', 'su', 900), ('セ', 'se', 900), ('ソ', 'so', 900),
-    ('タ', 'ta', 900), ('チ', 'chi', 900), ('ツ', 'tsu', 900), ('テ', 'te', 900), ('ト', 'to', 900),
-    ('ナ', 'na', 900), ('ニ', 'ni', 900), ('ヌ', 'nu', 900), ('ネ', 'ne', 900), ('ノ', 'no', 900),
-    ('ハ', 'ha', 900), ('ヒ', 'hi', 900), ('フ', 'fu', 900), ('ヘ', 'he', 900), ('ホ', 'ho', 900),
-    ('マ', 'ma', 900), ('ミ', 'mi', 900), ('ム', 'mu', 900), ('メ', 'me', 900), ('モ', 'mo', 900),
-    ('ヤ', 'ya', 900), ('ユ', 'yu', 900), ('ヨ', 'yo', 900),
-    ('ラ', 'ra', 900), ('リ', 'ri', 900), ('ル', 'ru', 900), ('レ', 're', 900), ('ロ', 'ro', 900),
-    ('ワ', 'wa', 900), ('ヲ', 'wo', 900), ('ン', 'n', 900),
+import pickle
+import queue
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 假名表：(平假名, 罗马音[, 输入码])，输入码省略时与罗马音相同
+# 片假名由平假名平移得到；KANA_TO_ROMA、KANA_ENTRIES 和罗马音转换都由这张表生成
+KANA_SEION = [
+    ('あ', 'a'), ('い', 'i'), ('う', 'u'), ('え', 'e'), ('お', 'o'),
+    ('か', 'ka'), ('き', 'ki'), ('く', 'ku'), ('け', 'ke'), ('こ', 'ko'),
+    ('さ', 'sa'), ('し', 'shi'), ('す', 'su'), ('せ', 'se'), ('そ', 'so'),
+    ('た', 'ta'), ('ち', 'chi'), ('つ', 'tsu'), ('て', 'te'), ('と', 'to'),
+    ('な', 'na'), ('に', 'ni'), ('ぬ', 'nu'), ('ね', 'ne'), ('の', 'no'),
+    ('は', 'ha'), ('ひ', 'hi'), ('ふ', 'fu'), ('へ', 'he'), ('ほ', 'ho'),
+    ('ま', 'ma'), ('み', 'mi'), ('む', 'mu'), ('め', 'me'), ('も', 'mo'),
+    ('や', 'ya'), ('ゆ', 'yu'), ('よ', 'yo'),
+    ('ら', 'ra'), ('り', 'ri'), ('る', 'ru'), ('れ', 're'), ('ろ', 'ro'),
+    ('わ', 'wa'), ('を', 'wo'), ('ん', 'n'),
 ]
+# 浊音
+KANA_DAKUON = [
+    ('が', 'ga'), ('ぎ', 'gi'), ('ぐ', 'gu'), ('げ', 'ge'), ('ご', 'go'),
+    ('ざ', 'za'), ('じ', 'ji'), ('ず', 'zu'), ('ぜ', 'ze'), ('ぞ', 'zo'),
+    ('だ', 'da'), ('ぢ', 'ji', 'di'), ('づ', 'zu', 'du'), ('で', 'de'), ('ど', 'do'),
+    ('ば', 'ba'), ('び', 'bi'), ('ぶ', 'bu'), ('べ', 'be'), ('ぼ', 'bo'),
+    ('ぱ', 'pa'), ('ぴ', 'pi'), ('ぷ', 'pu'), ('ぺ', 'pe'), ('ぽ', 'po'),
+]
+# 拗音
+KANA_YOON = [
+    ('きゃ', 'kya'), ('きゅ', 'kyu'), ('きょ', 'kyo'),
+    ('しゃ', 'sha'), ('しゅ', 'shu'), ('しょ', 'sho'),
+    ('ちゃ', 'cha'), ('ちゅ', 'chu'), ('ちょ', 'cho'),
+    ('にゃ', 'nya'), ('にゅ', 'nyu'), ('にょ', 'nyo'),
+    ('ひゃ', 'hya'), ('ひゅ', 'hyu'), ('ひょ', 'hyo'),
+    ('みゃ', 'mya'), ('みゅ', 'myu'), ('みょ', 'myo'),
+    ('りゃ', 'rya'), ('りゅ', 'ryu'), ('りょ', 'ryo'),
+    ('ぎゃ', 'gya'), ('ぎゅ', 'gyu'), ('ぎょ', 'gyo'),
+    ('じゃ', 'ja'), ('じゅ', 'ju'), ('じょ', 'jo'),
+    ('びゃ', 'bya'), ('びゅ', 'byu'), ('びょ', 'byo'),
+    ('ぴゃ', 'pya'), ('ぴゅ', 'pyu'), ('ぴょ', 'pyo'),
+]
+KANA_TABLE = KANA_SEION + KANA_DAKUON + KANA_YOON
+
+# 日语假名单字词条：(假名组, 平假名权重, 片假名权重)，片假名只收清音
+KANA_ENTRY_GROUPS = [(KANA_SEION, 1000, 900), (KANA_DAKUON, 900, None), (KANA_YOON, 800, None)]
+
+def to_katakana(kana):
+    return ''.join(chr(ord(c) + 0x60) for c in kana)
+
+def build_kana_entries(groups):
+    entries = []
+    for katakana in (False, True):
+        for rows, hiragana_weight, katakana_weight in groups:
+            weight = katakana_weight if katakana else hiragana_weight
+            if weight is None:
+                continue
+            for kana, roma, *code in rows:
+                entries.append((to_katakana(kana) if katakana else kana, code[0] if code else roma, weight))
+    return entries
+
+# 对照表中单独查表时的促音和长音（romanize_many 按前后文另行处理）
+KANA_TO_ROMA_MARKS = {'っ': '', 'ッ': '', 'ー': '-'}
+
+def build_kana_to_roma(table):
+    # 假名转罗马音对照表（平假名、片假名）
+    kana_to_roma = {}
+    for kana, roma, *_ in table:
+        kana_to_roma[kana] = roma
+        kana_to_roma[to_katakana(kana)] = roma
+    kana_to_roma.update(KANA_TO_ROMA_MARKS)
+    return kana_to_roma
+
+KANA_ENTRIES = build_kana_entries(KANA_ENTRY_GROUPS)
+KANA_TO_ROMA = build_kana_to_roma(KANA_TABLE)
 
 # 日本汉字多音字
 JP_KANJI_POLYPHONIC = [
@@ -56,136 +112,288 @@ JP_KANJI_POLYPHONIC = [
     ('喰', 'sun', 2000),
 ]
 
-# 假名转罗马音对照表
-KANA_TO_ROMA = {
-    # 平假名
-    'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
-    'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
-    'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
-    'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
-    'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
-    'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
-    'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
-    'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
-    'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
-    'わ': 'wa', 'を': 'wo', 'ん': 'n',
-    'が': 'ga', 'ぎ': 'gi', 'ぐ': 'gu', 'げ': 'ge', 'ご': 'go',
-    'ざ': 'za', 'じ': 'ji', 'ず': 'zu', 'ぜ': 'ze', 'ぞ': 'zo',
-    'だ': 'da', 'ぢ': 'ji', 'づ': 'zu', 'で': 'de', 'ど': 'do',
-    'ば': 'ba', 'び': 'bi', 'ぶ': 'bu', 'べ': 'be', 'ぼ': 'bo',
-    'ぱ': 'pa', 'ぴ': 'pi', 'ぷ': 'pu', 'ぺ': 'pe', 'ぽ': 'po',
-    'きゃ': 'kya', 'きゅ': 'kyu', 'きょ': 'kyo',
-    'しゃ': 'sha', 'しゅ': 'shu', 'しょ': 'sho',
-    'ちゃ': 'cha', 'ちゅ': 'chu', 'ちょ': 'cho',
-    'にゃ': 'nya', 'にゅ': 'nyu', 'にょ': 'nyo',
-    'ひゃ': 'hya', 'ひゅ': 'hyu', 'ひょ': 'hyo',
-    'みゃ': 'mya', 'みゅ': 'myu', 'みょ': 'myo',
-    'りゃ': 'rya', 'りゅ': 'ryu', 'りょ': 'ryo',
-    'ぎゃ': 'gya', 'ぎゅ': 'gyu', 'ぎょ': 'gyo',
-    'じゃ': 'ja', 'じゅ': 'ju', 'じょ': 'jo',
-    'びゃ': 'bya', 'びゅ': 'byu', 'びょ': 'byo',
-    'ぴゃ': 'pya', 'ぴゅ': 'pyu', 'ぴょ': 'pyo',
-    'っ': '',
-    # 片假名
-    'ア': 'a', 'イ': 'i', 'ウ': 'u', 'エ': 'e', 'オ': 'o',
-    'カ': 'ka', 'キ': 'ki', 'ク': 'ku', 'ケ': 'ke', 'コ': 'ko',
-    'サ': 'sa', 'シ': 'shi', 'ス': 'su', 'セ': 'se', 'ソ': 'so',
-    'タ': 'ta', 'チ': 'chi', 'ツ': 'tsu', 'テ': 'te', 'ト': 'to',
-    'ナ': 'na', 'ニ': 'ni', 'ヌ': 'nu', 'ネ': 'ne', 'ノ': 'no',
-    'ハ': 'ha', 'ヒ': 'hi', 'フ': 'fu', 'ヘ': 'he', 'ホ': 'ho',
-    'マ': 'ma', 'ミ': 'mi', 'ム': 'mu', 'メ': 'me', 'モ': 'mo',
-    'ヤ': 'ya', 'ユ': 'yu', 'ヨ': 'yo',
-    'ラ': 'ra', 'リ': 'ri', 'ル': 'ru', 'レ': 're', 'ロ': 'ro',
-    'ワ': 'wa', 'ヲ': 'wo', 'ン': 'n',
-    'ガ': 'ga', 'ギ': 'gi', 'グ': 'gu', 'ゲ': 'ge', 'ゴ': 'go',
-    'ザ': 'za', 'ジ': 'ji', 'ズ': 'zu', 'ゼ': 'ze', 'ゾ': 'zo',
-    'ダ': 'da', 'ヂ': 'ji', 'ヅ': 'zu', 'デ': 'de', 'ド': 'do',
-    'バ': 'ba', 'ビ': 'bi', 'ブ': 'bu', 'ベ': 'be', 'ボ': 'bo',
-    'パ': 'pa', 'ピ': 'pi', 'プ': 'pu', 'ペ': 'pe', 'ポ': 'po',
-    'キャ': 'kya', 'キュ': 'kyu', 'キョ': 'kyo',
-    'シャ': 'sha', 'シュ': 'shu', 'ショ': 'sho',
-    'チャ': 'cha', 'チュ': 'chu', 'チョ': 'cho',
-    'ニャ': 'nya', 'ニュ': 'nyu', 'ニョ': 'nyo',
-    'ヒャ': 'hya', 'ヒュ': 'hyu', 'ヒョ': 'hyo',
-    'ミャ': 'mya', 'ミュ': 'myu', 'ミョ': 'myo',
-    'リャ': 'rya', 'リュ': 'ryu', 'リョ': 'ryo',
-    'ギャ': 'gya', 'ギュ': 'gyu', 'ギョ': 'gyo',
-    'ジャ': 'ja', 'ジュ': 'ju', 'ジョ': 'jo',
-    'ビャ': 'bya', 'ビュ': 'byu', 'ビョ': 'byo',
-    'ピャ': 'pya', 'ピュ': 'pyu', 'ピョ': 'pyo',
-    'ッ': '', 'ー': '-',
-}
+# 罗马音转换：先用 str.translate 逐字替换，再用几条正则处理拗音、促音和长音
+# 拗音的小字 ゃゅょ、促音 っ、长音 ー 先替换成标记字符，由后面的正则按上下文改写
+KANA_YOON_MARK = '\x02'
+KANA_SOKUON_MARK = '\x03'
+KANA_CHOON_MARK = '\x04'
+
+def compile_kana_romanizer(table):
+    mapping = {}
+    for kana, roma, *_ in table:
+        if len(kana) == 1:
+            mapping[ord(kana)] = roma
+            mapping[ord(to_katakana(kana))] = roma
+    for small, vowel in (('ゃ', 'a'), ('ゅ', 'u'), ('ょ', 'o')):
+        mapping[ord(small)] = mapping[ord(to_katakana(small))] = KANA_YOON_MARK + vowel
+    mapping[ord('っ')] = mapping[ord('ッ')] = KANA_SOKUON_MARK
+    mapping[ord('ー')] = KANA_CHOON_MARK
+    
+    # (标记, [(正则, 替换)])：文本中没有该标记时整组跳过
+    rules = [
+        # 拗音：しゃ→sha、ちゃ→cha、じゃ→ja，其余 きゃ→kya；前面不是 i 段时按 ya/yu/yo
+        (KANA_YOON_MARK, [
+            (re.compile(f'(sh|ch|j)i{KANA_YOON_MARK}'), r'\1'),
+            (re.compile(f'([a-z])i{KANA_YOON_MARK}'), r'\1y'),
+            (re.compile(KANA_YOON_MARK), 'y'),
+        ]),
+        # 促音：重复后一个辅音，ち 前写作 t；后面没有辅音时省略
+        (KANA_SOKUON_MARK, [
+            (re.compile(f'{KANA_SOKUON_MARK}(?=ch)'), 't'),
+            (re.compile(f'{KANA_SOKUON_MARK}([bcdfghjkmpqrstvwz])'), r'\1\1'),
+            (re.compile(KANA_SOKUON_MARK), ''),
+        ]),
+        # 长音：重复前一个元音，前面不是元音时省略
+        (KANA_CHOON_MARK, [
+            (re.compile(f'([aeiou]){KANA_CHOON_MARK}+'), r'\1\1'),
+            (re.compile(KANA_CHOON_MARK), ''),
+        ]),
+    ]
+    return str.maketrans(mapping), rules
+
+KANA_ROMANIZER = compile_kana_romanizer(KANA_TABLE)
+
+def _romanize(text):
+    mapping, rules = KANA_ROMANIZER
+    text = text.translate(mapping)
+    for mark, group in rules:
+        if mark in text:
+            for pattern, repl in group:
+                text = pattern.sub(repl, text)
+    return text
+
+def romanize_many(texts):
+    # 批量转换：以换行拼成一个字符串，整体只做一次 translate 和每条正则一次替换
+    # 本身含换行的文本单独转换，否则拆分后会错位
+    texts = list(texts)
+    batch = [text for text in texts if '\n' not in text]
+    results = iter(_romanize('\n'.join(batch)).split('\n') if batch else ())
+    return [next(results) if '\n' not in text else _romanize(text) for text in texts]
 
 def kana_to_romaji(text):
-    result = ''
-    i = 0
-    while i < len(text):
-        if i + 1 < len(text):
-            two_char = text[i:i+2]
-            if two_char in KANA_TO_ROMA:
-                result += KANA_TO_ROMA[two_char]
-                i += 2
-                continue
-        one_char = text[i]
-        if one_char in KANA_TO_ROMA:
-            result += KANA_TO_ROMA[one_char]
+    return romanize_many([text])[0]
+
+KANA_RE = re.compile(r'[\u3040-\u309F\u30A0-\u30FF]')
+LATIN_START_RE = re.compile(r'^[A-Za-z]')
+
+# 附加数据表：首次使用时才加载，并缓存为二进制快照
+# 快照按源文件的修改时间和大小判断是否有效；时间变化但内容哈希不变时继续使用
+SIDE_TABLE_DIR = os.path.dirname(__file__)
+SIDE_TABLE_FILES = {
+    'jp_surnames': 'japanese_surnames.txt',
+    'split_names': 'names_splitted.txt',
+    'jp_cn_translations': 'jp_cn_translations.txt',
+}
+SIDE_TABLE_SNAPSHOT = 'side_tables.pickle'
+SIDE_TABLE_SNAPSHOT_VERSION = 1
+
+def parse_jp_surnames(f):
+    # 日本姓氏
+    return {line.strip() for line in f}
+
+def parse_split_names(f):
+    # 已分离的名字：全名 -> (姓, 名)
+    split_names = {}
+    for line in f:
+        parts = line.strip().split('\t')
+        if len(parts) >= 3 and parts[1]:
+            split_names[parts[0]] = (parts[1], parts[2])
+    return split_names
+
+def parse_jp_cn_translations(f):
+    # 日文到中文翻译
+    translations = {}
+    for line in f:
+        parts = line.strip().split('\t')
+        if len(parts) == 2:
+            translations[parts[0]] = parts[1]
+    return translations
+
+SIDE_TABLE_PARSERS = {
+    'jp_surnames': parse_jp_surnames,
+    'split_names': parse_split_names,
+    'jp_cn_translations': parse_jp_cn_translations,
+}
+
+class SideTables:
+    def __init__(self, jp_surnames, split_names, jp_cn_translations, digests=None):
+        self.jp_surnames = jp_surnames
+        self.split_names = split_names
+        self.jp_cn_translations = jp_cn_translations
+        # {表名: 源文件摘要的十六进制，文件不存在时为 None}
+        self.digests = digests or {}
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.digest()
+
+def load_side_tables(directory, snapshot_path=None):
+    snapshot_path = snapshot_path or os.path.join(directory, SIDE_TABLE_SNAPSHOT)
+    snapshot = {}
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != SIDE_TABLE_SNAPSHOT_VERSION:
+            snapshot = {}
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        snapshot = {}
+    old_sources = snapshot.get('sources', {})
+    old_tables = snapshot.get('tables', {})
+    
+    sources = {}
+    tables = {}
+    changed = False
+    for name, filename in SIDE_TABLE_FILES.items():
+        path = os.path.join(directory, filename)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            # 文件不存在时为空表，与之前一样
+            sources[name] = None
+            tables[name] = SIDE_TABLE_PARSERS[name](())
+            changed |= old_sources.get(name, 0) is not None
+            continue
+        
+        old = old_sources.get(name)
+        if old is not None and name in old_tables and old[:2] == (st.st_mtime_ns, st.st_size):
+            sources[name] = old
+            tables[name] = old_tables[name]
+            continue
+        
+        digest = file_digest(path)
+        sources[name] = (st.st_mtime_ns, st.st_size, digest)
+        changed = True
+        if old is not None and name in old_tables and old[2] == digest:
+            tables[name] = old_tables[name]
         else:
-            result += one_char
-        i += 1
-    return result
-
-# 加载日本姓氏
-JP_SURNAMES = set()
-surname_file = os.path.join(os.path.dirname(__file__), 'japanese_surnames.txt')
-if os.path.exists(surname_file):
-    with open(surname_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            JP_SURNAMES.add(line.strip())
-    print(f'Loaded {len(JP_SURNAMES)} Japanese surnames')
-
-# 加载已分离的名字
-SPLIT_NAMES = {}
-split_file = os.path.join(os.path.dirname(__file__), 'names_splitted.txt')
-if os.path.exists(split_file):
-    with open(split_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 3 and parts[1]:
-                SPLIT_NAMES[parts[0]] = (parts[1], parts[2])
-    print(f'Loaded {len(SPLIT_NAMES)} pre-split names')
-
-# 加载日文到中文翻译
-JP_CN_TRANSLATIONS = {}
-trans_file = os.path.join(os.path.dirname(__file__), 'jp_cn_translations.txt')
-if os.path.exists(trans_file):
-    with open(trans_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) == 2:
-                JP_CN_TRANSLATIONS[parts[0]] = parts[1]
-    print(f'Loaded {len(JP_CN_TRANSLATIONS)} JP-CN translations')
+            with open(path, 'r', encoding='utf-8') as f:
+                tables[name] = SIDE_TABLE_PARSERS[name](f)
+    
+    if changed:
+        tmp_path = snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': SIDE_TABLE_SNAPSHOT_VERSION, 'sources': sources, 'tables': tables},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, snapshot_path)
+        except OSError:
+            # 目录不可写时只是下次无法复用快照
+            pass
+    digests = {name: source[2].hex() if source else None for name, source in sources.items()}
+    return SideTables(digests=digests, **tables)
+
+_SIDE_TABLES = None
+
+def side_tables():
+    global _SIDE_TABLES
+    if _SIDE_TABLES is None:
+        _SIDE_TABLES = load_side_tables(SIDE_TABLE_DIR)
+    return _SIDE_TABLES
+
+def replace_side_tables(tables, trie=None):
+    # 换用重新读入的附加数据表（常驻模式）；不给出 trie 时姓氏字典树在下次使用时重建
+    global _SIDE_TABLES, _SURNAME_TRIE
+    _SIDE_TABLES = tables
+    _SURNAME_TRIE = trie
+
+# 兼容旧的模块级名字：convert_to_rime_final.SPLIT_NAMES 等仍可访问
+SIDE_TABLE_ATTRS = {
+    'JP_SURNAMES': 'jp_surnames',
+    'SPLIT_NAMES': 'split_names',
+    'JP_CN_TRANSLATIONS': 'jp_cn_translations',
+}
+
+def __getattr__(name):
+    if name in SIDE_TABLE_ATTRS:
+        return getattr(side_tables(), SIDE_TABLE_ATTRS[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+TONE_MAP = {
+    'ā': 'a', 'á': 'a', 'ǎ': 'a', 'à': 'a',
+    'ē': 'e', 'é': 'e', 'ě': 'e', 'è': 'e',
+    'ī': 'i', 'í': 'i', 'ǐ': 'i', 'ì': 'i',
+    'ō': 'o', 'ó': 'o', 'ǒ': 'o', 'ò': 'o',
+    'ū': 'u', 'ú': 'u', 'ǔ': 'u', 'ù': 'u',
+    'ǖ': 'v', 'ǘ': 'v', 'ǚ': 'v', 'ǜ': 'v',
+    'ü': 'v'
+}
+TONE_TABLE = str.maketrans(TONE_MAP)
 
 def remove_tone(pinyin):
-    tone_map = {
-        'ā': 'a', 'á': 'a', 'ǎ': 'a', 'à': 'a',
-        'ē': 'e', 'é': 'e', 'ě': 'e', 'è': 'e',
-        'ī': 'i', 'í': 'i', 'ǐ': 'i', 'ì': 'i',
-        'ō': 'o', 'ó': 'o', 'ǒ': 'o', 'ò': 'o',
-        'ū': 'u', 'ú': 'u', 'ǔ': 'u', 'ù': 'u',
-        'ǖ': 'v', 'ǘ': 'v', 'ǚ': 'v', 'ǜ': 'v',
-        'ü': 'v'
-    }
-    result = ''
-    for char in pinyin:
-        result += tone_map.get(char, char)
-    return result
+    return pinyin.translate(TONE_TABLE)
+
+# 拼音缓存：词 -> 以空格分隔的音节，跨次运行保存在磁盘上
+PINYIN_CACHE = {}
+PINYIN_CACHE_STATS = {'hits': 0, 'misses': 0}
+# 缓存内容的格式，改变时旧缓存失效（2：音节以空格分隔）
+PINYIN_CACHE_FORMAT = 2
+
+# 输出编码的格式：SYLLABLE_CODES 为真时音节之间保留空格（Rime 部署时不必再切分音节），
+# ENTRY_STEMS 为真时多音节词条另加一列声母缩写（Rime 的 stem 列）；Rime 只在构词时读取 stem，
+# 查询输入时不用它，所以这一列不提供声母简拼，只供 dict_query.py --initials 离线检查
+SYLLABLE_CODES = False
+ENTRY_STEMS = False
+
+def set_code_format(syllables=False, stems=False):
+    global SYLLABLE_CODES, ENTRY_STEMS
+    # 声母缩写按音节取首字母，需要音节编码
+    SYLLABLE_CODES = syllables or stems
+    ENTRY_STEMS = stems
+
+def pinyin_cache_key():
+    # pypinyin 版本、声调表或缓存格式变化时缓存失效
+    import pypinyin
+    h = hashlib.sha1()
+    h.update(str(PINYIN_CACHE_FORMAT).encode('utf-8'))
+    h.update(pypinyin.__version__.encode('utf-8'))
+    h.update(json.dumps(sorted(TONE_MAP.items()), ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+def load_pinyin_cache(path):
+    PINYIN_CACHE.clear()
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    if data.get('key') != pinyin_cache_key():
+        return 0
+    PINYIN_CACHE.update(data.get('codes', {}))
+    return len(PINYIN_CACHE)
+
+def save_pinyin_cache(path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': pinyin_cache_key(), 'codes': PINYIN_CACHE}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def get_syllables(word):
+    # 'mao yu na'
+    syllables = PINYIN_CACHE.get(word)
+    if syllables is not None:
+        PINYIN_CACHE_STATS['hits'] += 1
+        return syllables
+    
+    PINYIN_CACHE_STATS['misses'] += 1
+    # pypinyin 导入较慢，到第一次需要计算拼音时才导入
+    from pypinyin import lazy_pinyin, Style
+    syllables = ' '.join(lazy_pinyin(word, style=Style.TONE)).translate(TONE_TABLE)
+    PINYIN_CACHE[word] = syllables
+    return syllables
 
 def get_pinyin(word):
-    pinyin_list = lazy_pinyin(word, style=Style.TONE)
-    result = ''
-    for p in pinyin_list:
-        result += remove_tone(p)
-    return result
+    # 按 SYLLABLE_CODES 给出 'mao yu na' 或 'maoyuna'
+    syllables = get_syllables(word)
+    return syllables if SYLLABLE_CODES else syllables.replace(' ', '')
+
+def syllable_initials(code):
+    # 'mao yu na' -> 'myn'
+    return ''.join(syllable[0] for syllable in code.split(' ') if syllable)
 
 def is_valid_chinese_word(word, allow_single=False):
     if not word or len(word.strip()) == 0:
@@ -215,210 +423,481 @@ DOUBLE_SURNAMES = set([
     '伊藤','丰田','松下','索尼','任天堂','大桥','山川','佐藤','铃木','高橋','山本','中村','小林','加藤','吉田','山田','佐々木','近藤','齐藤','藤堂','黑崎','久保','木之本','土屋','卡斯兰','德丽莎','符华'
 ])
 
-def split_name(name):
+# 姓氏字典树：内置单字、复姓表，日本姓氏表，以及预分离名字中的多字姓氏
+SURNAME_END = 0
+_SURNAME_TRIE = None
+
+def build_surname_trie(surnames):
+    trie = {}
+    for surname in surnames:
+        node = trie
+        for char in surname:
+            node = node.setdefault(char, {})
+        node[SURNAME_END] = True
+    return trie
+
+def surname_set(tables):
+    surnames = SINGLE_SURNAMES | DOUBLE_SURNAMES | tables.jp_surnames
+    # 预分离结果里的单字姓歧义太大，只取两字及以上的中文姓氏
+    surnames |= {surname for surname, _ in tables.split_names.values()
+                 if len(surname) >= 2 and is_valid_chinese_word(surname)}
+    return surnames
+
+def surname_trie():
+    global _SURNAME_TRIE
+    if _SURNAME_TRIE is None:
+        _SURNAME_TRIE = build_surname_trie(surname_set(side_tables()))
+    return _SURNAME_TRIE
+
+def split_name(name, trie=None, overrides=None):
     # 如果有预分离的结果，直接使用
-    if name in SPLIT_NAMES:
-        surname, given = SPLIT_NAMES[name]
+    if overrides is None:
+        overrides = side_tables().split_names
+    if name in overrides:
+        surname, given = overrides[name]
         return [name, surname, given]
     
-    parts = []
     name_len = len(name)
+    if name_len < 3:
+        return [name] if name_len == 2 else []
     
-    if name_len == 2:
-        parts.append(name)
-    elif name_len >= 3:
-        if name[:2] in DOUBLE_SURNAMES:
-            parts.append(name)
-            if name_len == 3:
-                parts.append(name[:2])
-                parts.append(name[2:])
-            elif name_len == 4:
-                parts.append(name[:2])
-                parts.append(name[2:])
-            else:
-                parts.append(name[:2])
-                parts.append(name[2:4])
-                parts.append(name[2:])
-        else:
-            parts.append(name)
-            if name_len == 3:
-                parts.append(name[0])
-                parts.append(name[1:])
-            elif name_len == 4:
-                parts.append(name[:2])
-                parts.append(name[2:])
-            else:
-                parts.append(name[0])
-                parts.append(name[:2])
-                parts.append(name[2:4])
-                parts.append(name[1:])
+    # 在姓氏字典树上做最长前缀匹配，至少给名留一个字
+    surname_len = 0
+    node = (trie if trie is not None else surname_trie()).get(name[0])
+    if node is not None:
+        # 单字姓只用于三字名，更长的名字多为日本人名，首字是单字姓的概率不高
+        if SURNAME_END in node and name_len == 3:
+            surname_len = 1
+        for i in range(1, name_len - 1):
+            node = node.get(name[i])
+            if node is None:
+                break
+            if SURNAME_END in node:
+                surname_len = i + 1
+    
+    if surname_len:
+        given = name[surname_len:]
+        if len(given) >= 3:
+            return [name, name[:surname_len], given[:2], given]
+        return [name, name[:surname_len], given]
     
-    return parts
+    # 没有匹配到姓氏时按位置切分
+    if name_len == 3:
+        return [name, name[0], name[1:]]
+    if name_len == 4:
+        return [name, name[:2], name[2:]]
+    return [name, name[0], name[:2], name[2:4], name[1:]]
+
+def segment_names(names, trie=None, overrides=None):
+    # 批量分词：预分离表和姓氏字典树只取一次，按 names 的顺序给出各名字的分词
+    if trie is None:
+        trie = surname_trie()
+    if overrides is None:
+        overrides = side_tables().split_names
+    for name in names:
+        yield split_name(name, trie, overrides)
+
+# 权重规则：可用 --weight-config 读入的 JSON 覆盖（tune_weights.py 可导出）
+# 原始权重大于阈值时除以对应的除数，从大到小取第一个满足的；都不满足时保持原值（至少为 1）
+SCALE_BREAKPOINTS = [(100000, 20), (50000, 15), (10000, 10), (5000, 5), (1000, 3), (100, 2)]
+# 英文词按类别先除以除数再换算
+ENGLISH_DIVISORS = {'abbreviation': 10, 'caps': 10, 'alnum': 2}
+# 换算后低于此权重、以拉丁字母开头的英文词不收录（删除约60%低权重英文）
+ENGLISH_THRESHOLD = 89
+KANA_NAME_WEIGHT = 30
+
+WEIGHT_CONFIG_KEYS = ('scale_breakpoints', 'english_divisors', 'english_threshold', 'kana_name_weight')
+
+def weight_config():
+    return {
+        'scale_breakpoints': [list(b) for b in SCALE_BREAKPOINTS],
+        'english_divisors': dict(ENGLISH_DIVISORS),
+        'english_threshold': ENGLISH_THRESHOLD,
+        'kana_name_weight': KANA_NAME_WEIGHT,
+    }
+
+def check_weight_config(config):
+    # 返回以当前规则补全的配置；格式不对时抛出 ValueError
+    unknown = set(config) - set(WEIGHT_CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f'unknown weight settings: {", ".join(sorted(unknown))}')
+    merged = weight_config()
+    merged.update(config)
+    breakpoints = [tuple(b) for b in merged['scale_breakpoints']]
+    if any(len(b) != 2 or b[1] < 1 for b in breakpoints):
+        raise ValueError('scale_breakpoints must be [threshold, divisor] pairs with divisor >= 1')
+    thresholds = [threshold for threshold, _ in breakpoints]
+    if thresholds != sorted(thresholds, reverse=True):
+        raise ValueError('scale_breakpoints must be ordered from the largest threshold down')
+    divisors = merged['english_divisors']
+    if set(divisors) != set(ENGLISH_DIVISORS) or any(d < 1 for d in divisors.values()):
+        raise ValueError(f'english_divisors needs {", ".join(ENGLISH_DIVISORS)}, each >= 1')
+    merged['scale_breakpoints'] = [list(b) for b in breakpoints]
+    return merged
+
+def apply_weight_config(config):
+    global SCALE_BREAKPOINTS, ENGLISH_DIVISORS, ENGLISH_THRESHOLD, KANA_NAME_WEIGHT
+    config = check_weight_config(config)
+    SCALE_BREAKPOINTS = [tuple(b) for b in config['scale_breakpoints']]
+    ENGLISH_DIVISORS = dict(config['english_divisors'])
+    ENGLISH_THRESHOLD = config['english_threshold']
+    KANA_NAME_WEIGHT = config['kana_name_weight']
+
+def load_weight_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        apply_weight_config(json.load(f))
+
+SHORT_ABBR_RE = re.compile(r'^(TV|OVA|PC|PS[2345]?|RPG|AVG|ACT|GAL|OST|ED|OP|WEB|JRPG|ARPG|OAD|NDS|PSP|STEAM|JUMP|R18|3D|FPS|RTS|STG|SRPG|AIR|ELF|ARC|ADV|SLG|MOBILE|EVA|JOJO|KEY|BGM|CD|DVD|BL|GL|UC|IX|IQ|NET|AMV|MAD)$', re.IGNORECASE)
+CAPS_RE = re.compile(r'^[A-Z]{1,4}$')
+ALNUM_RE = re.compile(r'^\d+[A-Za-z]*$|^[A-Za-z]+\d+$')
+
+def english_weight_class(word):
+    # ENGLISH_DIVISORS 中的类别，普通英文词为 None
+    if SHORT_ABBR_RE.match(word):
+        return 'abbreviation'
+    if CAPS_RE.match(word):
+        return 'caps'
+    if ALNUM_RE.match(word):
+        return 'alnum'
+    return None
 
 def get_english_weight(word, base_weight):
-    short_abbr = re.compile(r'^(TV|OVA|PC|PS[2345]?|RPG|AVG|ACT|GAL|OST|ED|OP|WEB|JRPG|ARPG|OAD|NDS|PSP|STEAM|JUMP|R18|3D|FPS|RTS|STG|SRPG|AIR|ELF|ARC|ADV|SLG|MOBILE|EVA|JOJO|KEY|BGM|CD|DVD|BL|GL|UC|IX|IQ|NET|AMV|MAD)$', re.IGNORECASE)
-    if short_abbr.match(word):
-        return base_weight // 10
-    
-    if re.match(r'^[A-Z]{1,4}$', word):
-        return base_weight // 10
-    
-    if re.match(r'^\d+[A-Za-z]*$', word) or re.match(r'^[A-Za-z]+\d+$', word):
-        return base_weight // 2
-    
-    return base_weight
+    word_class = english_weight_class(word)
+    if word_class is None:
+        return base_weight
+    return base_weight // ENGLISH_DIVISORS[word_class]
 
 def scale_weight(weight):
-    if weight == 0:
-        return 1
-    
-    if weight > 100000:
-        return weight // 20
-    elif weight > 50000:
-        return weight // 15
-    elif weight > 10000:
-        return weight // 10
-    elif weight > 5000:
-        return weight // 5
-    elif weight > 1000:
-        return weight // 3
-    elif weight > 100:
-        return weight // 2
-    else:
-        return max(weight, 1)
+    for threshold, divisor in SCALE_BREAKPOINTS:
+        if weight > threshold:
+            return weight // divisor
+    return max(weight, 1)
 
-def extract_chinese_name(infobox):
+INFOBOX_ITEM_RE = re.compile(r'\[([^\]]+)\]')
+
+# 词库只用到这几个字段；键以它们结尾的字段也算（中文别名 归入 别名），与原先搜索 "别名=" 的结果一致
+INFOBOX_KEYS = ('简体中文名', '别名', '昵称')
+# 取 {...} 列表的字段：同一个键出现多次时取第一个列表值（原先按 "别名=\s*\{" 搜索），单行的值只在没有列表时保留
+INFOBOX_LIST_KEYS = ('别名',)
+
+def parse_infobox(infobox, keys=None):
+    # 单次遍历 Bangumi wiki 模板，返回 {键: 值}
+    # 单行字段为字符串；{...} 字段为 [...] 内原文组成的列表，如 ['甲', '英文名|Foo']
+    # 传入 keys 时只解析键以这些键结尾的字段，并以对应的 keys 中的键保存，其余字段不做切分
+    fields = {}
     if not infobox:
-        return None
+        return fields
     
-    match = re.search(r'简体中文名=\s*([^\r\n]+)', infobox)
-    if match:
-        return match.group(1).strip()
+    for chunk in infobox.split('\n|')[1:]:
+        key, sep, value = chunk.partition('=')
+        if not sep:
+            continue
+        key = key.strip()
+        if keys is not None:
+            if not key.endswith(keys):
+                continue
+            key = next(k for k in keys if key.endswith(k))
+        if key in fields and (key not in INFOBOX_LIST_KEYS or isinstance(fields[key], list)):
+            continue
+        value = value.strip()
+        if value.startswith('{'):
+            fields[key] = INFOBOX_ITEM_RE.findall(value.partition('}')[0])
+        elif key in fields:
+            continue
+        elif '\n' in value:
+            fields[key] = value.partition('\n')[0].rstrip()
+        else:
+            fields[key] = value
+    
+    return fields
+
+def _infobox_fields(infobox):
+    if isinstance(infobox, dict):
+        return infobox
+    return parse_infobox(infobox, INFOBOX_KEYS)
+
+def extract_chinese_name(infobox):
+    value = _infobox_fields(infobox).get('简体中文名')
+    if value and isinstance(value, str):
+        return value
     return None
 
 def extract_aliases(infobox):
-    if not infobox:
+    value = _infobox_fields(infobox).get('别名')
+    if not isinstance(value, list):
         return []
     
     aliases = []
-    
-    alias_match = re.search(r'别名=\s*\{([^}]+)\}', infobox, re.DOTALL)
-    if alias_match:
-        alias_text = alias_match.group(1)
-        alias_list = re.findall(r'\[([^\]]+)\]', alias_text)
-        for alias in alias_list:
-            alias = alias.strip()
-            if alias and not alias.startswith('第二中文名') and not alias.startswith('英文名'):
-                aliases.append(alias)
+    for alias in value:
+        alias = alias.strip()
+        if alias and not alias.startswith('第二中文名') and not alias.startswith('英文名'):
+            aliases.append(alias)
     
     return aliases
 
 def extract_nickname(infobox):
-    if not infobox:
+    # 只识别单行的 [甲][乙] 写法，与之前的输出保持一致
+    value = _infobox_fields(infobox).get('昵称')
+    if not value or not isinstance(value, str):
         return []
     
-    nicknames = []
-    nick_match = re.search(r'昵称=\s*([^\r\n]+)', infobox)
-    if nick_match:
-        nick_text = nick_match.group(1).strip()
-        if nick_text:
-            nick_list = re.findall(r'\[([^\]]+)\]', nick_text)
-            nicknames.extend([n.strip() for n in nick_list])
-    
-    return nicknames
+    return [n.strip() for n in INFOBOX_ITEM_RE.findall(value)]
 
-def process_character_jsonlines(filepath):
-    words = {}
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+def find_chunk_offsets(filepath, n_chunks):
+    # 按字节切分文件，边界对齐到行首
+    size = os.path.getsize(filepath)
+    offsets = [0]
+    with open(filepath, 'rb') as f:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= offsets[-1]:
                 continue
-            
+            f.seek(target - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+    offsets.append(size)
+    return offsets
+
+def iter_jsonlines(filepath, start=0, end=None, member=None):
+    lines = _iter_jsonlines(filepath, start, end, member)
+    if PROFILER is not None and PROFILER.pid == os.getpid():
+        lines = PROFILER.track_lines(lines)
+    return lines
+
+def _iter_jsonlines(filepath, start=0, end=None, member=None):
+    # member 不为空时 filepath 是 Archive 的 zip 包，直接从包内流式读取
+    if member is not None:
+        yield from iter_zip_jsonlines(filepath, member)
+        return
+    
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(raw)
             try:
-                data = json.loads(line)
-            except:
+                line = raw.decode('utf-8').strip()
+            except UnicodeDecodeError:
+                # 不是合法 UTF-8 的行与无法解析的行一样计数跳过
+                count_malformed(filepath, member)
                 continue
-            
-            collects = data.get('collects', 0)
-            
-            infobox = data.get('infobox', '')
-            
-            chinese_name = extract_chinese_name(infobox)
-            if chinese_name and is_valid_chinese_word(chinese_name):
-                words[chinese_name] = words.get(chinese_name, 0) + collects + 1
-                
-                for part in split_name(chinese_name):
-                    if part and is_valid_chinese_word(part, allow_single=True):
-                        words[part] = words.get(part, 0) + collects // 4 + 1
-            
-            aliases = extract_aliases(infobox)
-            for alias in aliases:
-                if alias and is_valid_chinese_word(alias):
-                    words[alias] = words.get(alias, 0) + collects // 2 + 1
-                    
-                    for part in split_name(alias):
-                        if part and is_valid_chinese_word(part, allow_single=True):
-                            words[part] = words.get(part, 0) + collects // 8 + 1
-            
-            nicknames = extract_nickname(infobox)
-            for nick in nicknames:
-                if nick and is_valid_chinese_word(nick):
-                    words[nick] = words.get(nick, 0) + collects // 2 + 1
-                    
-                    for part in split_name(nick):
-                        if part and is_valid_chinese_word(part, allow_single=True):
-                            words[part] = words.get(part, 0) + collects // 8 + 1
-    
-    return words
+            if line:
+                yield line
 
-def process_person_jsonlines(filepath):
-    words = {}
+ZIP_READ_SIZE = 1 << 20
+ZIP_QUEUE_SIZE = 16
+
+def find_archive_member(archive_path, filename):
+    with zipfile.ZipFile(archive_path) as zf:
+        for name in zf.namelist():
+            if name == filename or name.endswith('/' + filename):
+                return name
+    raise FileNotFoundError(f'{filename} not found in {archive_path}')
+
+def iter_zip_jsonlines(archive_path, member):
+    # 后台线程负责解压和切行，经有界队列交给解析，不落盘
+    batches = queue.Queue(maxsize=ZIP_QUEUE_SIZE)
+    stop = threading.Event()
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            
+    def put(item):
+        while not stop.is_set():
             try:
-                data = json.loads(line)
-            except:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
                 continue
-            
-            collects = data.get('collects', 0)
-            
-            infobox = data.get('infobox', '')
-            
-            chinese_name = extract_chinese_name(infobox)
-            if chinese_name and is_valid_chinese_word(chinese_name):
-                words[chinese_name] = words.get(chinese_name, 0) + collects + 1
-                
-                for part in split_name(chinese_name):
-                    if part and is_valid_chinese_word(part, allow_single=True):
-                        words[part] = words.get(part, 0) + collects // 4 + 1
-            
-            aliases = extract_aliases(infobox)
-            for alias in aliases:
-                if alias and is_valid_chinese_word(alias):
-                    words[alias] = words.get(alias, 0) + collects // 2 + 1
-                    
-                    for part in split_name(alias):
-                        if part and is_valid_chinese_word(part, allow_single=True):
-                            words[part] = words.get(part, 0) + collects // 8 + 1
-            
-            nicknames = extract_nickname(infobox)
-            for nick in nicknames:
-                if nick and is_valid_chinese_word(nick):
-                    words[nick] = words.get(nick, 0) + collects // 2 + 1
-                    
-                    for part in split_name(nick):
-                        if part and is_valid_chinese_word(part, allow_single=True):
-                            words[part] = words.get(part, 0) + collects // 8 + 1
+        return False
     
+    def reader():
+        try:
+            with zipfile.ZipFile(archive_path) as zf, zf.open(member) as f:
+                tail = b''
+                while True:
+                    block = f.read(ZIP_READ_SIZE)
+                    if not block:
+                        break
+                    lines = (tail + block).split(b'\n')
+                    tail = lines.pop()
+                    if not put(lines):
+                        return
+                if tail:
+                    put([tail])
+        except BaseException as e:
+            put(e)
+            return
+        put(None)
+    
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            for raw in batch:
+                try:
+                    line = raw.decode('utf-8').strip()
+                except UnicodeDecodeError:
+                    count_malformed(archive_path, member)
+                    continue
+                if line:
+                    yield line
+    finally:
+        stop.set()
+        thread.join()
+
+# 两阶段聚合：先按名字累计 (整名权重, 每个分词的权重)，最后每个名字只分词一次
+def add_name(names, name, weight, part_weight):
+    entry = names.get(name)
+    if entry is None:
+        names[name] = (weight, part_weight)
+    else:
+        names[name] = (entry[0] + weight, entry[1] + part_weight)
+
+def merge_names(chunk_results):
+    # 按分块顺序合并，保持与单进程相同的插入顺序
+    merged = {}
+    for names in chunk_results:
+        for name, (weight, part_weight) in names.items():
+            add_name(merged, name, weight, part_weight)
+    return merged
+
+def iter_name_parts(names, split=True, allow_single=True, trie=None, overrides=None):
+    # 按名字首次出现的顺序给出 (词, 权重)，词的首次出现顺序与逐条记录累加时相同
+    # trie / overrides 默认取当前附加数据表对应的姓氏字典树和预分离表
+    if not split:
+        for name, (weight, _) in names.items():
+            yield name, weight
+        return
+    
+    for (name, (weight, part_weight)), parts in zip(names.items(), segment_names(names, trie, overrides)):
+        yield name, weight
+        for part in parts:
+            if part and is_valid_chinese_word(part, allow_single=allow_single):
+                yield part, part_weight
+
+def expand_names(names, split=True, allow_single=True):
+    words = {}
+    for word, weight in iter_name_parts(names, split, allow_single):
+        words[word] = words.get(word, 0) + weight
     return words
 
+# JSON 解码层：可用时使用 orjson，否则回退到标准库
+JSON_BACKENDS = {'json': json.loads}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = orjson.loads
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+json_loads = JSON_BACKENDS[JSON_BACKEND]
+
+def set_json_backend(name):
+    global JSON_BACKEND, json_loads
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in JSON_BACKENDS else 'json'
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'JSON backend {name!r} is not available')
+    JSON_BACKEND = name
+    json_loads = JSON_BACKENDS[name]
+
+# 各数据文件实际用到的字段，其余字段解码后立即丢弃
+NAME_RECORD_FIELDS = ('collects', 'infobox')
+SUBJECT_RECORD_FIELDS = ('name', 'name_cn', 'infobox', 'score', 'favorite', 'tags')
+
+# 文件名 -> 无法解析的行数
+MALFORMED_LINES = {}
+
+def decode_record(line, fields):
+    # 整行照常完整解码（summary 等大字段也不例外），只是结果只保留 fields，聚合和缓存不带多余字段
+    data = json_loads(line)
+    if not isinstance(data, dict):
+        raise ValueError('record is not a JSON object')
+    return {key: data[key] for key in fields if key in data}
+
+def count_malformed(filepath, member=None):
+    name = os.path.basename(member or filepath)
+    MALFORMED_LINES[name] = MALFORMED_LINES.get(name, 0) + 1
+
+def iter_records(filepath, fields, start=0, end=None, member=None):
+    for line in iter_jsonlines(filepath, start, end, member):
+        try:
+            yield decode_record(line, fields)
+        except ValueError:
+            count_malformed(filepath, member)
+
+def aggregate_jsonlines(dump, filepath, start=0, end=None, member=None):
+    add_record, fields, _ = DUMPS[dump]
+    outputs = tuple({} for _ in DUMPS[dump][2])
+    for data in iter_records(filepath, fields, start, end, member):
+        add_record(data, *outputs)
+    return outputs
+
+def expand_outputs(dump, outputs):
+    return tuple(expand_names(names, **rule) for names, rule in zip(outputs, DUMPS[dump][2]))
+
+def iter_outputs(dump, outputs):
+    # 与 expand_outputs 相同，但不生成中间字典，直接交给 WeightTable 累加
+    return tuple(iter_name_parts(names, **rule) for names, rule in zip(outputs, DUMPS[dump][2]))
+
+def process_chunk(dump, filepath, start, end):
+    # 在子进程中运行，连同本块的坏行数一起返回
+    MALFORMED_LINES.clear()
+    return aggregate_jsonlines(dump, filepath, start, end), dict(MALFORMED_LINES)
+
+def load_jsonlines(dump, filepath, executor=None, n_chunks=1, member=None):
+    if member is not None or executor is None:
+        # zip 内的文件无法按字节切块，在当前进程流式处理
+        return aggregate_jsonlines(dump, filepath, member=member)
+    
+    offsets = find_chunk_offsets(filepath, n_chunks)
+    futures = [executor.submit(process_chunk, dump, filepath, start, end)
+               for start, end in zip(offsets, offsets[1:])]
+    results = []
+    for future, start, end in zip(futures, offsets, offsets[1:]):
+        result, malformed = future.result()
+        results.append(result)
+        if PROFILER is not None:
+            PROFILER.advance(end - start)
+        for name, count in malformed.items():
+            MALFORMED_LINES[name] = MALFORMED_LINES.get(name, 0) + count
+    return tuple(merge_names([r[i] for r in results]) for i in range(len(results[0])))
+
+def add_name_record(data, names):
+    # character / person 记录共用：简体中文名、别名、昵称
+    collects = data.get('collects', 0)
+    
+    infobox = parse_infobox(data.get('infobox', ''), INFOBOX_KEYS)
+    
+    chinese_name = extract_chinese_name(infobox)
+    if chinese_name and is_valid_chinese_word(chinese_name):
+        add_name(names, chinese_name, collects + 1, collects // 4 + 1)
+    
+    aliases = extract_aliases(infobox)
+    for alias in aliases:
+        if alias and is_valid_chinese_word(alias):
+            add_name(names, alias, collects // 2 + 1, collects // 8 + 1)
+    
+    nicknames = extract_nickname(infobox)
+    for nick in nicknames:
+        if nick and is_valid_chinese_word(nick):
+            add_name(names, nick, collects // 2 + 1, collects // 8 + 1)
+
+def process_character_jsonlines(filepath, start=0, end=None, member=None):
+    return expand_outputs('character', aggregate_jsonlines('character', filepath, start, end, member))[0]
+
+def process_person_jsonlines(filepath, start=0, end=None, member=None):
+    return expand_outputs('person', aggregate_jsonlines('person', filepath, start, end, member))[0]
+
+CJK_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+DIGITS_RE = re.compile(r'^\d+$')
+ENGLISH_WORD_RE = re.compile(r'^[a-zA-Z0-9\s\.\-\+]+$')
+
 def is_valid_english_word(word):
     if not word or len(word.strip()) == 0:
         return False
@@ -429,182 +908,1891 @@ def is_valid_english_word(word):
     if len(word) < 2:
         return False
     
-    if re.search(r'[\u4e00-\u9fff]', word):
+    if CJK_CHAR_RE.search(word):
         return False
     
-    if re.match(r'^\d+$', word):
+    if DIGITS_RE.match(word):
         return False
     
-    if not re.match(r'^[a-zA-Z0-9\s\.\-\+]+$', word):
+    if not ENGLISH_WORD_RE.match(word):
         return False
     
     return True
 
-def process_subject_jsonlines(filepath):
-    chinese_words = {}
-    english_words = {}
+def add_subject_record(data, chinese_names, english_words):
+    score = data.get('score', 0)
+    collect_count = data.get('favorite', {}).get('done', 0)
+    weight = int(score * 10) + collect_count // 10
     
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+    if 'name_cn' in data:
+        name_cn = data.get('name_cn', '')
+        if name_cn and is_valid_chinese_word(name_cn):
+            add_name(chinese_names, name_cn, weight, weight // 2)
+    
+    infobox = parse_infobox(data.get('infobox', ''), INFOBOX_KEYS)
+    
+    chinese_name = extract_chinese_name(infobox)
+    if chinese_name and is_valid_chinese_word(chinese_name):
+        add_name(chinese_names, chinese_name, weight, weight // 2)
+    
+    aliases = extract_aliases(infobox)
+    for alias in aliases:
+        if alias and is_valid_chinese_word(alias):
+            add_name(chinese_names, alias, weight // 2, weight // 4)
+    
+    # 先判断数值条件，低分作品的标签不必逐个校验
+    if score >= 6.5:
+        tags = data.get('tags', [])
+        for tag in tags:
+            tag_name = tag.get('name', '')
+            tag_count = tag.get('count', 0)
             
+            if tag_count >= 30 and is_valid_english_word(tag_name):
+                add_name(english_words, tag_name, tag_count + weight, 0)
+    
+    name = data.get('name', '')
+    if score >= 7.0 and collect_count >= 30 and is_valid_english_word(name):
+        add_name(english_words, name, weight, 0)
+
+def process_subject_jsonlines(filepath, start=0, end=None, member=None):
+    return expand_outputs('subject', aggregate_jsonlines('subject', filepath, start, end, member))
+
+# 增量构建：保存每条记录的内容哈希和它对词频的贡献
+RECORD_ID_RE = re.compile(r'\{\s*"id"\s*:\s*(\d+)')
+
+def incremental_state_key():
+    # 脚本本身或分词用到的表变化时，已保存的贡献全部作废
+    h = hashlib.sha1()
+    with open(os.path.abspath(__file__), 'rb') as f:
+        h.update(f.read())
+    tables = side_tables()
+    for table in (sorted(tables.split_names.items()), sorted(tables.jp_surnames),
+                  sorted(SINGLE_SURNAMES), sorted(DOUBLE_SURNAMES)):
+        h.update(json.dumps(table, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+def load_incremental_state(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    if state.get('key') != incremental_state_key():
+        return {}
+    return state.get('files', {})
+
+def save_incremental_state(path, files):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'key': incremental_state_key(), 'files': files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def process_jsonlines_incremental(dump, filepath, old_records, member=None):
+    # old_records / records: {(记录 id, 第几次出现): (内容哈希, 每个输出一个名字聚合字典)}，按文件顺序
+    # 没有 id 的行用内容哈希代替 id；重复的 id 或相同的行各占一个键，贡献不会互相覆盖
+    # 只重新解析新增或内容变化的记录，再按文件顺序合并，结果与全量构建一致
+    add_record, fields, rules = DUMPS[dump]
+    records = {}
+    occurrences = {}
+    stats = {'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+    
+    for line in iter_jsonlines(filepath, member=member):
+        digest = hashlib.blake2b(line.encode('utf-8'), digest_size=16).digest()
+        match = RECORD_ID_RE.match(line)
+        record_id = int(match.group(1)) if match else digest
+        n = occurrences.get(record_id, 0)
+        occurrences[record_id] = n + 1
+        record_key = (record_id, n)
+        
+        old = old_records.get(record_key)
+        if old is not None and old[0] == digest:
+            records[record_key] = old
+            stats['unchanged'] += 1
+            continue
+        stats['changed' if old is not None else 'added'] += 1
+        
+        contributions = tuple({} for _ in rules)
+        try:
+            data = decode_record(line, fields)
+        except ValueError:
+            count_malformed(filepath, member)
+            data = None
+        if data is not None:
+            add_record(data, *contributions)
+        records[record_key] = (digest, contributions)
+    
+    stats['removed'] = sum(1 for record_key in old_records if record_key not in records)
+    outputs = tuple(merge_names([c[i] for _, c in records.values()]) for i in range(len(rules)))
+    return outputs, records, stats
+
+def load_jsonlines_incremental(dump, filepath, old_state, new_state, member=None):
+    outputs, records, stats = process_jsonlines_incremental(dump, filepath, old_state.get(dump, {}), member)
+    new_state[dump] = records
+    print(f"  {stats['added']} added, {stats['changed']} changed, "
+          f"{stats['removed']} removed, {stats['unchanged']} unchanged records")
+    return outputs
+
+# 数据文件的行索引：每行的起始偏移、记录 id 和热度，保存在 <数据文件>.offsets，按 (mtime_ns, 大小) 判断是否失效
+# 热度：character / person 为 collects，subject 为 favorite.done；--sample 按热度分层抽样，只读取抽到的行
+LINE_INDEX_SUFFIX = '.offsets'
+LINE_INDEX_VERSION = 1
+LINE_INDEX_FIELDS = ('id', 'collects', 'favorite')
+
+def record_popularity(data):
+    favorite = data.get('favorite')
+    popularity = favorite.get('done', 0) if isinstance(favorite, dict) else data.get('collects', 0)
+    return popularity if isinstance(popularity, int) else 0
+
+def popularity_bucket(popularity):
+    # 按数量级分层：0, 1-9, 10-99, 100-999, ...
+    return len(str(popularity)) if popularity > 0 else 0
+
+def bucket_label(bucket):
+    return '0' if bucket == 0 else f'{10 ** (bucket - 1)}-{10 ** bucket - 1}'
+
+class LineIndex:
+    def __init__(self, path, rebuild=False):
+        self.path = path
+        self.index_path = path + LINE_INDEX_SUFFIX
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        # 空文件无法 mmap
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.rebuilt = False
+        saved = None if rebuild else self.load_index()
+        if saved is None:
+            saved = self.build_index()
+            self.rebuilt = True
+        self.offsets, self.ids, self.popularity = saved
+        if self.rebuilt:
+            self.save_index()
+        self._by_id = None
+    
+    def source_key(self):
+        st = os.fstat(self.file.fileno())
+        return (st.st_mtime_ns, st.st_size)
+    
+    def build_index(self):
+        # 坏行也计入索引（id 为 -1，热度为 0），抽样读取时照常计为坏行
+        offsets = array('q')
+        ids = array('q')
+        popularity = array('q')
+        self.file.seek(0)
+        pos = 0
+        for raw in self.file:
+            line = raw.strip()
+            if line:
+                try:
+                    data = decode_record(line, LINE_INDEX_FIELDS)
+                except ValueError:
+                    data = {}
+                record_id = data.get('id')
+                offsets.append(pos)
+                ids.append(record_id if isinstance(record_id, int) else -1)
+                popularity.append(record_popularity(data))
+            pos += len(raw)
+        return offsets, ids, popularity
+    
+    def load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if saved.get('version') != LINE_INDEX_VERSION or saved.get('source') != self.source_key():
+            return None
+        return saved['offsets'], saved['ids'], saved['popularity']
+    
+    def save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': LINE_INDEX_VERSION, 'source': self.source_key(), 'offsets': self.offsets,
+                             'ids': self.ids, 'popularity': self.popularity}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # 目录不可写时只是下次要重新建索引
+            pass
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def line(self, i):
+        start = self.offsets[i]
+        end = self.mm.find(b'\n', start)
+        return self.mm[start:end if end >= 0 else len(self.mm)].decode('utf-8').strip()
+    
+    def find(self, record_id):
+        # 按记录 id 取行号，没有时为 None；id 重复时取第一行
+        if self._by_id is None:
+            self._by_id = {}
+            for i, record_id_at in enumerate(self.ids):
+                self._by_id.setdefault(record_id_at, i)
+        return self._by_id.get(record_id)
+    
+    def buckets(self):
+        # {热度层: [行号]}
+        buckets = {}
+        for i, popularity in enumerate(self.popularity):
+            buckets.setdefault(popularity_bucket(popularity), []).append(i)
+        return buckets
+    
+    def sample(self, fraction, seed=0):
+        # 每个热度层各抽 fraction（至少一行），返回按文件顺序排列的行号，以及 {热度层: (行数, 抽到的行数)}
+        rng = random.Random(seed)
+        lines = []
+        strata = {}
+        for bucket, bucket_lines in sorted(self.buckets().items()):
+            k = min(len(bucket_lines), max(1, round(len(bucket_lines) * fraction)))
+            lines.extend(rng.sample(bucket_lines, k))
+            strata[bucket] = (len(bucket_lines), k)
+        lines.sort()
+        return lines, strata
+    
+    def close(self):
+        if self.mm:
+            self.mm.close()
+        self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def sample_jsonlines(dump, filepath, fraction, seed=0):
+    # 只解析分层抽样的行；按文件顺序处理，抽样结果与同样几行的全量处理一致
+    add_record, fields, rules = DUMPS[dump]
+    outputs = tuple({} for _ in rules)
+    with LineIndex(filepath) as index:
+        lines, strata = index.sample(fraction, seed)
+        for i in lines:
             try:
-                data = json.loads(line)
-            except:
+                data = decode_record(index.line(i), fields)
+            except ValueError:
+                count_malformed(filepath)
                 continue
-            
-            score = data.get('score', 0)
-            collect_count = data.get('favorite', {}).get('done', 0)
-            weight = int(score * 10) + collect_count // 10
-            
-            if 'name_cn' in data:
-                name_cn = data.get('name_cn', '')
-                if name_cn and is_valid_chinese_word(name_cn):
-                    chinese_words[name_cn] = chinese_words.get(name_cn, 0) + weight
-                    for part in split_name(name_cn):
-                        if is_valid_chinese_word(part):
-                            chinese_words[part] = chinese_words.get(part, 0) + weight // 2
-            
-            infobox = data.get('infobox', '')
-            
-            chinese_name = extract_chinese_name(infobox)
-            if chinese_name and is_valid_chinese_word(chinese_name):
-                chinese_words[chinese_name] = chinese_words.get(chinese_name, 0) + weight
-                for part in split_name(chinese_name):
-                    if is_valid_chinese_word(part):
-                        chinese_words[part] = chinese_words.get(part, 0) + weight // 2
-            
-            aliases = extract_aliases(infobox)
-            for alias in aliases:
-                if alias and is_valid_chinese_word(alias):
-                    chinese_words[alias] = chinese_words.get(alias, 0) + weight // 2
-                    for part in split_name(alias):
-                        if is_valid_chinese_word(part):
-                            chinese_words[part] = chinese_words.get(part, 0) + weight // 4
-            
-            tags = data.get('tags', [])
-            for tag in tags:
-                tag_name = tag.get('name', '')
-                tag_count = tag.get('count', 0)
-                
-                if is_valid_english_word(tag_name) and tag_count >= 30 and score >= 6.5:
-                    w = tag_count + weight
-                    english_words[tag_name] = english_words.get(tag_name, 0) + w
-            
-            name = data.get('name', '')
-            if is_valid_english_word(name) and score >= 7.0 and collect_count >= 30:
-                english_words[name] = english_words.get(name, 0) + weight
+            add_record(data, *outputs)
+        state = 'built' if index.rebuilt else 'loaded'
+        print(f"  Sampled {len(lines)} of {len(index)} records ({state} line index): "
+              + ', '.join(f'{bucket_label(bucket)}: {k}/{n}' for bucket, (n, k) in strata.items()))
+    return outputs
+
+class WeightTable:
+    # 所有来源共用一个字符串池，每个词只存一份；各来源的权重按列存在 array 中
+    # 词 id 按首次加入的顺序分配，与原先 dict 累加器的插入顺序一致
+    def __init__(self, columns, counted=False):
+        self.index = {}
+        self.words = []
+        self.columns = {name: array('q') for name in columns}
+        self.bits = {name: 1 << i for i, name in enumerate(columns)}
+        # 每个词出现在哪些列中（按位）
+        self.present = array('B')
+        # 是否作为完整的名字出现过；为 0 的词只来自名字的分词
+        self.primary = bytearray()
+        # counted 为真时记录每个词在各列中被加入的次数，remove 撤销到 0 时词从该列中去掉（常驻模式用）
+        self.counts = {name: array('I') for name in columns} if counted else None
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def word_id(self, word):
+        i = self.index.get(word)
+        if i is None:
+            i = len(self.words)
+            self.index[word] = i
+            self.words.append(word)
+            for weights in self.columns.values():
+                weights.append(0)
+            if self.counts is not None:
+                for counts in self.counts.values():
+                    counts.append(0)
+            self.present.append(0)
+            self.primary.append(0)
+        return i
     
-    return chinese_words, english_words
+    def add(self, column, pairs):
+        # pairs 为 (词, 权重) 序列，同一个词可以出现多次
+        weights = self.columns[column]
+        bit = self.bits[column]
+        present = self.present
+        if self.counts is None:
+            for word, weight in pairs:
+                i = self.word_id(word)
+                weights[i] += weight
+                present[i] |= bit
+            return
+        counts = self.counts[column]
+        for word, weight in pairs:
+            i = self.word_id(word)
+            weights[i] += weight
+            counts[i] += 1
+            present[i] |= bit
+    
+    def remove(self, column, pairs):
+        # 撤销之前 add 过的 (词, 权重)，只能用于 counted 的表
+        weights = self.columns[column]
+        counts = self.counts[column]
+        mask = ~self.bits[column]
+        present = self.present
+        index = self.index
+        for word, weight in pairs:
+            i = index[word]
+            weights[i] -= weight
+            counts[i] -= 1
+            if not counts[i]:
+                present[i] &= mask
+    
+    def mark_primary(self, names):
+        # names 为名字聚合（或任意词的集合），在 add 之后调用
+        index = self.index
+        primary = self.primary
+        for name in names:
+            i = index.get(name)
+            if i is not None:
+                primary[i] = 1
+    
+    def is_part(self, word):
+        # 只由名字分词得到的词；不在表中的词（假名等）不算
+        i = self.index.get(word)
+        return i is not None and not self.primary[i]
+    
+    def count(self, columns):
+        mask = sum(self.bits[name] for name in columns)
+        return sum(1 for flags in self.present if flags & mask)
+    
+    def totals(self, columns, dominant=False):
+        # 按词 id 顺序给出 (词, 这些列的权重合计)，只包含出现在这些列中的词
+        # dominant 为真时给出 (词, 合计, 权重最大的列名)，并列时取靠前的列
+        mask = sum(self.bits[name] for name in columns)
+        selected = [self.columns[name] for name in columns]
+        present = self.present
+        for i, word in enumerate(self.words):
+            if present[i] & mask:
+                if not dominant:
+                    yield word, sum(weights[i] for weights in selected)
+                    continue
+                best = max(range(len(columns)), key=lambda k: (selected[k][i], -k))
+                yield word, sum(weights[i] for weights in selected), columns[best]
 
-def main():
-    base_dir = r"C:\Users\feohz\Documents\bagumi_local"
+CHINESE_COLUMNS = ('character', 'person', 'subject_cn', 'translation')
+ENGLISH_COLUMNS = ('subject_en',)
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss / 1024
+
+# --profile：逐阶段记录耗时、吞吐量、峰值内存、正则调用次数和输入输出条数
+PROFILER = None
+PROFILE_PROGRESS_INTERVAL = 0.5
+# 统计这些预编译正则的调用和匹配次数（仅限主进程）
+PROFILED_PATTERNS = ('INFOBOX_ITEM_RE', 'CJK_CHAR_RE', 'DIGITS_RE', 'ENGLISH_WORD_RE',
+                     'LATIN_START_RE', 'KANA_RE', 'RECORD_ID_RE')
+
+class CountingPattern:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.calls = 0
+        self.matches = 0
     
-    all_chinese_words = {}
-    all_english_words = {}
+    def match(self, *args):
+        self.calls += 1
+        result = self.pattern.match(*args)
+        if result:
+            self.matches += 1
+        return result
     
-    print("Processing character.jsonlines...")
-    char_words = process_character_jsonlines(os.path.join(base_dir, 'character.jsonlines'))
-    for word, weight in char_words.items():
-        all_chinese_words[word] = all_chinese_words.get(word, 0) + weight
-    print(f"  Found {len(char_words)} words")
+    def search(self, *args):
+        self.calls += 1
+        result = self.pattern.search(*args)
+        if result:
+            self.matches += 1
+        return result
     
-    print("Processing person.jsonlines...")
-    person_words = process_person_jsonlines(os.path.join(base_dir, 'person.jsonlines'))
-    for word, weight in person_words.items():
-        all_chinese_words[word] = all_chinese_words.get(word, 0) + weight
-    print(f"  Found {len(person_words)} words")
+    def findall(self, *args):
+        self.calls += 1
+        result = self.pattern.findall(*args)
+        self.matches += len(result)
+        return result
+
+class ProfileStage:
+    def __init__(self, name, total_bytes=None, items_total=None):
+        self.name = name
+        self.items_in = 0
+        self.items_out = None
+        self.items_total = items_total
+        self.bytes_done = 0
+        self.bytes_total = total_bytes
+        self.seconds = 0.0
+        self.started = None
+        self.peak_rss_mb = None
+        self.regex = {}
+        # 嵌套的惰性阶段已单独计入的正则次数
+        self.regex_excluded = {}
     
-    print("Processing subject.jsonlines...")
-    subject_cn, subject_en = process_subject_jsonlines(os.path.join(base_dir, 'subject.jsonlines'))
-    for word, weight in subject_cn.items():
-        all_chinese_words[word] = all_chinese_words.get(word, 0) + weight
-    for word, weight in subject_en.items():
-        weight = get_english_weight(word, weight)
-        all_english_words[word] = all_english_words.get(word, 0) + weight
-    print(f"  Found {len(subject_cn)} Chinese words, {len(subject_en)} English words")
+    def elapsed(self, now):
+        return now - self.started if self.started is not None else self.seconds
     
-    # 添加日文翻译
-    print(f"\nAdding {len(JP_CN_TRANSLATIONS)} JP-CN translations...")
-    for jp_name, cn_name in JP_CN_TRANSLATIONS.items():
-        if cn_name and is_valid_chinese_word(cn_name):
-            # 中文翻译
-            all_chinese_words[cn_name] = all_chinese_words.get(cn_name, 0) + 50
-            # 分词
-            for part in split_name(cn_name):
-                if part and is_valid_chinese_word(part, allow_single=True):
-                    all_chinese_words[part] = all_chinese_words.get(part, 0) + 20
+    def fraction(self):
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.items_total:
+            return min(self.items_in / self.items_total, 1.0)
+        return None
     
-    print(f"\nScaling weights and writing output...")
+    def report(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 4),
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'items_per_sec': round(self.items_in / self.seconds) if self.seconds > 0 else None,
+            'bytes': self.bytes_total,
+            'peak_rss_mb': self.peak_rss_mb,
+            'regex': self.regex,
+        }
+
+class Profiler:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.live = self.stream.isatty()
+        self.pid = os.getpid()
+        self.started = time.perf_counter()
+        self.stages = []
+        self.current = None
+        self.last_progress = 0.0
+        self.patterns = {}
+        for name in PROFILED_PATTERNS:
+            self.patterns[name] = globals()[name] = CountingPattern(globals()[name])
+    
+    def regex_counts(self):
+        return {name: (p.calls, p.matches) for name, p in self.patterns.items()}
     
-    output_path = os.path.join(base_dir, 'bangumi.dict.yaml')
+    @contextlib.contextmanager
+    def stage(self, name, total_bytes=None, items_total=None):
+        stage = ProfileStage(name, total_bytes, items_total)
+        regex_before = self.regex_counts()
+        outer, self.current = self.current, stage
+        start = stage.started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - start
+            self.current = outer
+            self.finish(stage, regex_before)
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write("# Rime dictionary - Bangumi\n")
-        f.write("# encoding: utf-8\n\n")
-        f.write("---\n")
-        f.write("name: bangumi\n")
-        f.write("version: \"2026-03-01\"\n")
-        f.write("sort: by_weight\n")
-        f.write("...\n\n")
+    def finish(self, stage, regex_before):
+        stage.peak_rss_mb = peak_rss_mb()
+        for name, (calls, matches) in self.regex_counts().items():
+            excluded_calls, excluded_matches = stage.regex_excluded.get(name, (0, 0))
+            calls -= regex_before[name][0] + excluded_calls
+            matches -= regex_before[name][1] + excluded_matches
+            if calls:
+                stage.regex[name] = {'calls': calls, 'matches': matches}
+        self.stages.append(stage)
         
-        all_words_list = []
+        rate = f"{stage.items_in / stage.seconds:,.0f}/s" if stage.seconds > 0 else '-'
+        out = '' if stage.items_out is None else f" -> {stage.items_out:,}"
+        peak = '' if stage.peak_rss_mb is None else f", peak {stage.peak_rss_mb:.1f} MB"
+        self.clear_progress()
+        self.stream.write(f"  [profile] {stage.name}: {stage.seconds:.2f}s, "
+                          f"{stage.items_in:,}{out} items, {rate}{peak}\n")
+    
+    def advance(self, n_bytes=0, n_items=0):
+        stage = self.current
+        if stage is None:
+            return
+        stage.bytes_done += n_bytes
+        stage.items_in += n_items
+        self.progress()
+    
+    def track_lines(self, lines):
+        # 字节数按 UTF-8 编码长度估算（已去掉行尾），用于进度和 ETA
+        stage = self.current
+        if stage is None:
+            yield from lines
+            return
+        for line in lines:
+            stage.items_in += 1
+            stage.bytes_done += len(line.encode('utf-8')) + 1
+            if not stage.items_in & 0x3ff:
+                self.progress()
+            yield line
+    
+    def timed(self, name, items, items_total=None):
+        # 惰性生成的阶段：只计入从 items 取值所花的时间，取完后记为单独的阶段
+        stage = ProfileStage(name, items_total=items_total)
+        regex_before = self.regex_counts()
+        outer = self.current
+        n = 0
+        it = iter(items)
+        while True:
+            self.current = stage
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                stage.seconds += time.perf_counter() - start
+                break
+            finally:
+                self.current = outer
+            elapsed = time.perf_counter() - start
+            stage.seconds += elapsed
+            if outer is not None:
+                outer.seconds -= elapsed
+            n += 1
+            stage.items_in = n
+            if not n & 0x3ff:
+                self.progress(stage)
+            yield item
+        stage.items_out = n
+        self.finish(stage, regex_before)
+        if outer is not None:
+            for name, counts in stage.regex.items():
+                calls, matches = outer.regex_excluded.get(name, (0, 0))
+                outer.regex_excluded[name] = (calls + counts['calls'], matches + counts['matches'])
+    
+    def progress(self, stage=None):
+        stage = stage or self.current
+        if not self.live or stage is None:
+            return
+        now = time.perf_counter()
+        if now - self.last_progress < PROFILE_PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
         
-        for word, weight in all_chinese_words.items():
-            if word and len(word) > 0:
-                scaled_weight = scale_weight(weight)
-                pinyin = get_pinyin(word)
-                all_words_list.append((word, pinyin, scaled_weight))
+        elapsed = stage.elapsed(now) or 1e-9
+        line = f"  {stage.name}: {stage.items_in:,} items, {stage.items_in / elapsed:,.0f}/s"
+        fraction = stage.fraction()
+        if fraction:
+            eta = int(elapsed * (1 - fraction) / fraction)
+            line += f", {fraction:.1%}, ETA {eta // 60}:{eta % 60:02d}"
+        self.stream.write('\r' + line.ljust(78)[:78])
+        self.stream.flush()
+    
+    def clear_progress(self):
+        if self.live and self.last_progress:
+            self.stream.write('\r' + ' ' * 78 + '\r')
+            self.last_progress = 0.0
+    
+    def report(self, **extra):
+        regex = {name: {'calls': p.calls, 'matches': p.matches}
+                 for name, p in self.patterns.items() if p.calls}
+        return {
+            'generated': datetime.datetime.now().isoformat(timespec='seconds'),
+            **extra,
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': [stage.report() for stage in self.stages],
+            'regex': regex,
+        }
+
+def enable_profiler():
+    global PROFILER
+    PROFILER = Profiler()
+    return PROFILER
+
+def profile_stage(name, total_bytes=None, items_total=None):
+    if PROFILER is None:
+        return contextlib.nullcontext(ProfileStage(name))
+    return PROFILER.stage(name, total_bytes, items_total)
+
+def dump_size(filepath, member=None):
+    if member is None:
+        return os.path.getsize(filepath)
+    with zipfile.ZipFile(filepath) as zf:
+        return zf.getinfo(member).file_size
+
+def count_lines(filepath):
+    n = 0
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n += block.count(b'\n')
+    return n
+
+# 输出：按权重降序，同权重按加入顺序（序号）排列，三种排序方式结果一致
+OUTPUT_BATCH_LINES = 8192
+# 外部排序时每行前缀 (SORT_WEIGHT_LIMIT - 权重, 序号)，补零后可直接按字符串比较
+SORT_WEIGHT_LIMIT = 10 ** 12
+SORT_KEY_WIDTH = 12
+# 一次最多归并的分段数；分段更多时逐轮归并成更长的分段，避免同时打开过多文件
+MERGE_FAN_IN = 256
+
+def format_entry(word, code, weight):
+    # 只有多音节的编码才有声母缩写列，其余行省略这一列
+    if ENTRY_STEMS and ' ' in code:
+        return f"{word}\t{code}\t{weight}\t{syllable_initials(code)}\n"
+    return f"{word}\t{code}\t{weight}\n"
+
+def sort_entries_in_memory(entries):
+    words = []
+    codes = []
+    weights = array('q')
+    for word, code, weight in entries:
+        words.append(word)
+        codes.append(code)
+        weights.append(weight)
+    
+    # 稳定排序：同权重保持加入顺序
+    for i in sorted(range(len(weights)), key=weights.__getitem__, reverse=True):
+        yield format_entry(words[i], codes[i], weights[i])
+
+def top_entries(entries, max_entries):
+    # 堆中只保留 max_entries 条
+    top = heapq.nsmallest(max_entries, enumerate(entries), key=lambda item: (-item[1][2], item[0]))
+    for _, (word, code, weight) in top:
+        yield format_entry(word, code, weight)
+
+def _spill_run(lines, run_dir, n):
+    lines.sort()
+    path = os.path.join(run_dir, f'run{n:05d}.txt')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.writelines(lines)
+    return path
+
+def _merge_runs(paths, run_dir, n):
+    out_path = os.path.join(run_dir, f'merge{n:05d}.txt')
+    files = [open(path, 'r', encoding='utf-8', newline='') for path in paths]
+    try:
+        with open(out_path, 'w', encoding='utf-8', newline='') as out:
+            out.writelines(heapq.merge(*files))
+    finally:
+        for f in files:
+            f.close()
+    for path in paths:
+        os.remove(path)
+    return out_path
+
+def external_sort_entries(entries, run_size, tmp_dir=None, fan_in=MERGE_FAN_IN):
+    # 超过 run_size 条时把排好序的分段写入临时文件，最后多路归并
+    with tempfile.TemporaryDirectory(prefix='bangumi_sort_', dir=tmp_dir) as run_dir:
+        runs = []
+        lines = []
+        for seq, (word, code, weight) in enumerate(entries):
+            lines.append(f"{SORT_WEIGHT_LIMIT - weight:0{SORT_KEY_WIDTH}d}{seq:0{SORT_KEY_WIDTH}d}"
+                         + format_entry(word, code, weight))
+            if len(lines) >= run_size:
+                runs.append(_spill_run(lines, run_dir, len(runs)))
+                lines = []
         
-        for word, weight in all_english_words.items():
-            if word and len(word) > 0:
-                scaled_weight = scale_weight(weight)
-                all_words_list.append((word, word.lower().replace(' ', ''), scaled_weight))
+        if not runs:
+            lines.sort()
+            for line in lines:
+                yield line[2 * SORT_KEY_WIDTH:]
+            return
+        if lines:
+            runs.append(_spill_run(lines, run_dir, len(runs)))
+            lines = []
         
-        # 过滤英文词条：保留权重 >= 89 的（删除约60%低权重英文）
-        english_threshold = 89
-        all_words_list = [(w, p, wt) for w, p, wt in all_words_list 
-                          if not re.match(r'^[A-Za-z]', w) or wt >= english_threshold]
+        n_merged = 0
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                merged.append(_merge_runs(runs[i:i + fan_in], run_dir, n_merged))
+                n_merged += 1
+            runs = merged
         
-        # 为没有翻译的日文假名名字添加罗马音
-        jp_kana_words = []
-        for jp_name, cn_name in JP_CN_TRANSLATIONS.items():
-            # 如果有中文翻译，跳过
+        files = [open(path, 'r', encoding='utf-8', newline='') for path in runs]
+        try:
+            for line in heapq.merge(*files):
+                yield line[2 * SORT_KEY_WIDTH:]
+        finally:
+            for f in files:
+                f.close()
+
+def sort_entries(entries, max_entries=None, run_size=None, tmp_dir=None):
+    if max_entries is not None:
+        return top_entries(entries, max_entries)
+    if run_size is not None:
+        return external_sort_entries(entries, run_size, tmp_dir)
+    return sort_entries_in_memory(entries)
+
+def write_lines(f, lines, batch_size=OUTPUT_BATCH_LINES):
+    # 成批写入，返回写入的行数
+    count = 0
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            f.write(''.join(batch))
+            count += len(batch)
+            batch = []
+    if batch:
+        f.write(''.join(batch))
+        count += len(batch)
+    return count
+
+# 分片输出：每个分片是一个独立的词库，总词库用 import_tables 引用全部分片
+SHARDS = ('characters', 'persons', 'subjects', 'english', 'kana', 'kanji')
+# 中文词归入权重贡献最大的来源对应的分片，日文翻译的名字归入角色
+COLUMN_SHARDS = {
+    'character': 'characters',
+    'person': 'persons',
+    'subject_cn': 'subjects',
+    'translation': 'characters',
+    'subject_en': 'english',
+}
+
+def english_entry(word, weight, english_threshold):
+    # 换算后低于阈值、以拉丁字母开头的英文词不收录，返回 None
+    scaled_weight = scale_weight(get_english_weight(word, weight))
+    if scaled_weight < english_threshold and LATIN_START_RE.match(word):
+        return None
+    return (word, word.lower().replace(' ', ''), scaled_weight)
+
+# 英文写法变体合并：忽略大小写、空白、点和连字符后相同的词视为同一个词（Production I.G / ProductionI.G）
+# + 保留，避免 C++ 与 C 合并
+ENGLISH_KEY_RE = re.compile(r'[\s.\-]+')
+ENGLISH_MERGE_REPORT_TOP = 10
+
+def english_key(word):
+    return ENGLISH_KEY_RE.sub('', word.lower())
+
+def merge_english_variants(pairs):
+    # pairs 为 (词, 原始权重)；同一规范化键的写法权重相加，取原始权重最高的写法（并列取先出现的）
+    # 返回按各组首次出现顺序的 [(写法, 合计权重)]，以及 [(写法, 合计权重, [全部写法])]（只含有变体的组）
+    groups = {}
+    for word, weight in pairs:
+        # 只由空白和标点组成的词不参与合并
+        key = english_key(word) or word
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [word, weight, weight, [word]]
+        else:
+            if weight > group[1]:
+                group[0] = word
+                group[1] = weight
+            group[2] += weight
+            group[3].append(word)
+    merged = [(word, total) for word, _, total, _ in groups.values()]
+    variants = [(word, total, words) for word, _, total, words in groups.values() if len(words) > 1]
+    return merged, variants
+
+def english_merge_report(pairs, merged, variants, english_threshold=None):
+    # 合并前后的英文词条数（按收录阈值过滤后）和权重最高的合并组
+    if english_threshold is None:
+        english_threshold = ENGLISH_THRESHOLD
+    
+    def kept(items):
+        return sum(1 for word, weight in items if english_entry(word, weight, english_threshold) is not None)
+    
+    top = sorted(variants, key=lambda group: group[1], reverse=True)[:ENGLISH_MERGE_REPORT_TOP]
+    return {
+        'words': len(pairs),
+        'groups': len(variants),
+        'merged_words': sum(len(words) - 1 for _, _, words in variants),
+        'entries_before': kept(pairs),
+        'entries_after': kept(merged),
+        'top': [{'word': word, 'weight': total, 'variants': words} for word, total, words in top],
+    }
+
+def print_english_merge_report(report):
+    print(f"\nEnglish variants: {report['merged_words']} of {report['words']} words merged into "
+          f"{report['groups']} canonical forms; English entries {report['entries_before']} -> "
+          f"{report['entries_after']}")
+    for group in report['top']:
+        print(f"  {group['word']:<30}{group['weight']:>10}  " + ' | '.join(group['variants']))
+
+def iter_dict_entries(table, kana_names, english_threshold=None, shards=False, english=None):
+    # shards 为真时给出 (分片, 词条)，每个词条只属于一个分片
+    # english 为 (词, 原始权重) 序列时代替词频表中的英文词（如 merge_english_variants 的结果）
+    for item in table.totals(CHINESE_COLUMNS, dominant=shards):
+        word = item[0]
+        if word:
+            entry = (word, get_pinyin(word), scale_weight(item[1]))
+            yield (COLUMN_SHARDS[item[2]], entry) if shards else entry
+    
+    # 过滤英文词条：保留权重 >= english_threshold 的（默认 ENGLISH_THRESHOLD）
+    if english_threshold is None:
+        english_threshold = ENGLISH_THRESHOLD
+    if english is None:
+        english = table.totals(ENGLISH_COLUMNS)
+    for word, weight in english:
+        entry = english_entry(word, weight, english_threshold) if word else None
+        if entry is not None:
+            yield ('english', entry) if shards else entry
+    
+    for shard, entries in (('kana', kana_names), ('kana', KANA_ENTRIES), ('kanji', JP_KANJI_POLYPHONIC)):
+        if shards:
+            for entry in entries:
+                yield shard, entry
+        else:
+            yield from entries
+
+DICT_NAME = 'bangumi'
+DICT_VERSION = '2026-03-01'
+
+def write_dict_header(f, name, import_tables=()):
+    f.write("# Rime dictionary - Bangumi\n")
+    f.write("# encoding: utf-8\n\n")
+    f.write("---\n")
+    f.write(f"name: {name}\n")
+    f.write(f"version: \"{DICT_VERSION}\"\n")
+    f.write("sort: by_weight\n")
+    if ENTRY_STEMS:
+        f.write("columns:\n")
+        for column in ('text', 'code', 'weight', 'stem'):
+            f.write(f"  - {column}\n")
+    if import_tables:
+        f.write("import_tables:\n")
+        for table_name in import_tables:
+            f.write(f"  - {table_name}\n")
+    f.write("...\n\n")
+
+def write_shards(out_dir, tagged_entries):
+    # 按分片分桶后各自排序写出，再写引用全部分片的总词库；返回 {分片: (词库名, 条数, 字节数)}
+    buckets = {shard: [] for shard in SHARDS}
+    for shard, entry in tagged_entries:
+        buckets[shard].append(entry)
+    
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for shard in SHARDS:
+        name = f'{DICT_NAME}.{shard}'
+        path = os.path.join(out_dir, name + '.dict.yaml')
+        with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            write_dict_header(f, name)
+            count = write_lines(f, sort_entries(buckets.pop(shard)))
+        written[shard] = (name, count, os.path.getsize(path))
+    
+    with open(os.path.join(out_dir, DICT_NAME + '.dict.yaml'), 'w', encoding='utf-8') as f:
+        write_dict_header(f, DICT_NAME, [name for name, _, _ in written.values()])
+    return written
+
+def measure_rime_deploy(out_dir, dict_names, deployer):
+    # 用 rime_deployer 为每个词库单独编译一个最小方案，返回 {词库名: 秒数或 None}
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bangumi_deploy_') as work_dir:
+        for filename in os.listdir(out_dir):
+            if filename.endswith('.dict.yaml'):
+                shutil.copy(os.path.join(out_dir, filename), work_dir)
+        for i, dict_name in enumerate(dict_names):
+            schema_id = f'bangumi_deploy_{i}'
+            schema_path = os.path.join(work_dir, schema_id + '.schema.yaml')
+            with open(schema_path, 'w', encoding='utf-8') as f:
+                f.write(f"schema:\n  schema_id: {schema_id}\n  name: {schema_id}\n  version: \"1\"\n"
+                        f"translator:\n  dictionary: {dict_name}\n")
+            build_dir = os.path.join(work_dir, f'build{i}')
+            start = time.perf_counter()
+            proc = subprocess.run([deployer, '--compile', schema_path, work_dir, work_dir, build_dir],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            results[dict_name] = time.perf_counter() - start if proc.returncode == 0 else None
+    return results
+
+def measure_default_deploy(output_path, table, kana_names, deployer):
+    # 按默认格式（不合并英文变体、音节不分隔、没有缩写列）把同一张词频表写到临时目录，
+    # 与已写出的 output_path 分别编译，返回 (默认格式秒数, output_path 秒数)
+    code_format = (SYLLABLE_CODES, ENTRY_STEMS)
+    set_code_format()
+    try:
+        with tempfile.TemporaryDirectory(prefix='bangumi_default_') as tmp_dir:
+            with open(os.path.join(tmp_dir, DICT_NAME + '.dict.yaml'), 'w', encoding='utf-8', buffering=1 << 20) as f:
+                write_dict_header(f, DICT_NAME)
+                write_lines(f, sort_entries(iter_dict_entries(table, kana_names)))
+            before = measure_rime_deploy(tmp_dir, [DICT_NAME], deployer)[DICT_NAME]
+    finally:
+        set_code_format(*code_format)
+    with tempfile.TemporaryDirectory(prefix='bangumi_output_') as tmp_dir:
+        shutil.copy(output_path, tmp_dir)
+        after = measure_rime_deploy(tmp_dir, [DICT_NAME], deployer)[DICT_NAME]
+    return before, after
+
+# 同编码候选过多：按编码建索引，统计候选数分布，可选地限制每个编码的候选数
+CROWDING_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+CROWDING_REPORT_TOP = 20
+
+def index_codes(entries):
+    # {编码: [词条序号]}，序号按词条顺序
+    by_code = {}
+    for i, (_, code, _) in enumerate(entries):
+        # 按实际键入的字母分组，音节之间的空格不算
+        code = code.replace(' ', '')
+        ids = by_code.get(code)
+        if ids is None:
+            by_code[code] = [i]
+        else:
+            ids.append(i)
+    return by_code
+
+def crowding_histogram(by_code):
+    # {'1': 编码数, '2': ..., '3-5': ..., '>50': ...}
+    labels = []
+    low = 1
+    for high in CROWDING_BUCKETS:
+        labels.append((high, str(high) if high == low else f'{low}-{high}'))
+        low = high + 1
+    histogram = dict.fromkeys([label for _, label in labels] + [f'>{CROWDING_BUCKETS[-1]}'], 0)
+    for ids in by_code.values():
+        n = len(ids)
+        for high, label in labels:
+            if n <= high:
+                histogram[label] += 1
+                break
+        else:
+            histogram[f'>{CROWDING_BUCKETS[-1]}'] += 1
+    return histogram
+
+def cap_candidates(tagged_entries, max_per_code=None, is_part=None, top=CROWDING_REPORT_TOP):
+    # 每个编码最多保留 max_per_code 个候选：先丢分词得到的词，再按权重从低到高丢
+    # 返回 (按原顺序保留的 (分片, 词条), 报告)；max_per_code 为 None 时只统计
+    tags = []
+    entries = []
+    for tag, entry in tagged_entries:
+        tags.append(tag)
+        entries.append(entry)
+    is_part = is_part or (lambda word: False)
+    by_code = index_codes(entries)
+    
+    crowded = sorted(by_code.items(), key=lambda item: len(item[1]), reverse=True)[:top]
+    report = {
+        'entries': len(entries),
+        'codes': len(by_code),
+        'max_per_code': max_per_code,
+        'histogram': crowding_histogram(by_code),
+        'crowded': [{'code': code, 'candidates': len(ids),
+                     'words': [{'word': entries[i][0], 'weight': entries[i][2], 'part': is_part(entries[i][0])}
+                               for i in sorted(ids, key=lambda i: entries[i][2], reverse=True)]}
+                    for code, ids in crowded],
+    }
+    if max_per_code is None:
+        return list(zip(tags, entries)), report
+    
+    dropped = bytearray(len(entries))
+    n_capped = n_dropped = n_parts = 0
+    for ids in by_code.values():
+        if len(ids) <= max_per_code:
             continue
+        n_capped += 1
+        # 整名优先，其次权重高的，权重相同保持原顺序
+        ranked = sorted(ids, key=lambda i: (is_part(entries[i][0]), -entries[i][2]))
+        for i in ranked[max_per_code:]:
+            dropped[i] = 1
+            n_dropped += 1
+            n_parts += is_part(entries[i][0])
+    report['capped_codes'] = n_capped
+    report['dropped'] = n_dropped
+    report['dropped_parts'] = n_parts
+    return [(tag, entry) for tag, entry, drop in zip(tags, entries, dropped) if not drop], report
+
+def print_crowding_report(report, n_codes=10):
+    print(f"\n{report['entries']} entries on {report['codes']} codes; candidates per code:")
+    print('  ' + ', '.join(f'{label}: {n}' for label, n in report['histogram'].items()))
+    for item in report['crowded'][:n_codes]:
+        words = ' '.join(w['word'] + ('*' if w['part'] else '') for w in item['words'][:8])
+        more = ' ...' if len(item['words']) > 8 else ''
+        print(f"  {item['code']:<16}{item['candidates']:>5}  {words}{more}")
+    print("  (* = only produced by splitting names)")
+    if report['max_per_code'] is not None:
+        print(f"Capped {report['capped_codes']} codes at {report['max_per_code']} candidates: "
+              f"dropped {report['dropped']} entries ({report['dropped_parts']} from name splitting)")
+
+# 体积预算：在条数或字节数上限内尽量保留权重，各分片可设最少保留条数
+# 默认整片保留假名和日本汉字读音
+BUDGET_ALL = -1
+DEFAULT_BUDGET_MINIMUMS = {'kana': BUDGET_ALL, 'kanji': BUDGET_ALL}
+BUDGET_REPORT_TOP = 50
+
+def parse_budget_minimums(specs):
+    # ['characters=5000', 'kana=all'] -> {'characters': 5000, 'kana': BUDGET_ALL}
+    minimums = dict(DEFAULT_BUDGET_MINIMUMS)
+    for spec in specs:
+        shard, sep, value = spec.partition('=')
+        if not sep or shard not in SHARDS:
+            raise ValueError(f'expected SHARD=N or SHARD=all with SHARD one of {", ".join(SHARDS)}: {spec}')
+        if value == 'all':
+            minimums[shard] = BUDGET_ALL
+        elif value.isdigit():
+            minimums[shard] = int(value)
+        else:
+            raise ValueError(f'expected a count or "all": {spec}')
+    return minimums
+
+def select_budget(tagged_entries, max_entries=None, max_bytes=None, minimums=None):
+    # 条数预算按权重从高到低取；字节预算按每字节权重贪心装入（背包的近似解）
+    # 先满足各分片的最少条数，返回 (按原顺序保留的词条, 报告)
+    minimums = DEFAULT_BUDGET_MINIMUMS if minimums is None else minimums
+    shards = []
+    entries = []
+    for shard, entry in tagged_entries:
+        shards.append(shard)
+        entries.append(entry)
+    sizes = array('q', (len(format_entry(*entry).encode('utf-8')) for entry in entries))
+    if max_bytes is not None:
+        costs, budget = sizes, max_bytes
+    else:
+        costs = array('q', [1]) * len(entries)
+        budget = len(entries) if max_entries is None else max_entries
+    
+    by_weight = sorted(range(len(entries)), key=lambda i: entries[i][2], reverse=True)
+    kept = bytearray(len(entries))
+    used = 0
+    required = dict.fromkeys(SHARDS, 0)
+    for i in by_weight:
+        minimum = minimums.get(shards[i], 0)
+        if minimum == BUDGET_ALL or required[shards[i]] < minimum:
+            kept[i] = 1
+            used += costs[i]
+            required[shards[i]] += 1
+    
+    greedy = by_weight
+    if max_bytes is not None:
+        # 稳定排序，同样的每字节权重保持原顺序
+        greedy = sorted(by_weight, key=lambda i: entries[i][2] / costs[i], reverse=True)
+    for i in greedy:
+        if not kept[i] and used + costs[i] <= budget:
+            kept[i] = 1
+            used += costs[i]
+    
+    report = {
+        'budget': {'entries': max_entries, 'bytes': max_bytes},
+        'minimums': {shard: 'all' if n == BUDGET_ALL else n for shard, n in minimums.items()},
+        'over_budget': used > budget,
+        'shards': {shard: {'kept': 0, 'dropped': 0, 'kept_weight': 0, 'dropped_weight': 0,
+                           'kept_bytes': 0, 'min_kept_weight': None, 'max_dropped_weight': None}
+                   for shard in SHARDS},
+        'top_dropped': [],
+    }
+    for i in by_weight:
+        stats = report['shards'][shards[i]]
+        word, code, weight = entries[i]
+        if kept[i]:
+            stats['kept'] += 1
+            stats['kept_weight'] += weight
+            stats['kept_bytes'] += sizes[i]
+            stats['min_kept_weight'] = weight
+        else:
+            stats['dropped'] += 1
+            stats['dropped_weight'] += weight
+            if stats['max_dropped_weight'] is None:
+                stats['max_dropped_weight'] = weight
+            if len(report['top_dropped']) < BUDGET_REPORT_TOP:
+                report['top_dropped'].append({'word': word, 'code': code, 'weight': weight, 'shard': shards[i]})
+    
+    selected = [entry for i, entry in enumerate(entries) if kept[i]]
+    return selected, report
+
+def print_budget_report(report):
+    print(f"\n{'shard':<12}{'kept':>10}{'dropped':>10}{'weight kept':>14}{'KB':>10}{'min kept':>10}")
+    for shard, stats in report['shards'].items():
+        total = stats['kept_weight'] + stats['dropped_weight']
+        coverage = f"{stats['kept_weight'] / total:.1%}" if total else '-'
+        floor = stats['min_kept_weight'] if stats['min_kept_weight'] is not None else '-'
+        print(f"{shard:<12}{stats['kept']:>10}{stats['dropped']:>10}{coverage:>14}"
+              f"{stats['kept_bytes'] / 1024:>10.0f}{floor:>10}")
+    if report['over_budget']:
+        print("Warning: the --budget-min entries alone exceed the budget")
+    if report['top_dropped']:
+        top = ', '.join(f"{d['word']}({d['weight']})" for d in report['top_dropped'][:10])
+        print(f"Highest-weighted dropped: {top}")
+
+def load_kana_names(path):
+    # 读取名字分离结果，为没有中文翻译的假名名字添加罗马音
+    translations = side_tables().jp_cn_translations
+    names = []
+    for line in open(path, 'r', encoding='utf-8'):
+        parts = line.strip().split('\t')
+        if len(parts) >= 3 and parts[1]:
+            name = parts[0]
+            # 只处理包含假名、且没有中文翻译的名字
+            if KANA_RE.search(name) and name not in translations:
+                names.append(name)
+    
+    kana_names = []
+    for name, romaji in zip(names, romanize_many(names)):
+        if romaji and romaji != name:
+            kana_names.append((name, romaji, KANA_NAME_WEIGHT))
+    return kana_names
+
+# 数据文件 -> (单条记录处理函数, 用到的字段, 每个输出的分词规则)
+# subject 作品名的分词不保留单字姓氏，英文词不分词
+DUMPS = {
+    'character': (add_name_record, NAME_RECORD_FIELDS, ({'allow_single': True},)),
+    'person': (add_name_record, NAME_RECORD_FIELDS, ({'allow_single': True},)),
+    'subject': (add_subject_record, SUBJECT_RECORD_FIELDS, ({'allow_single': False}, {'split': False})),
+}
+
+def read_dump(name, base_dir, archive=None, executor=None, n_chunks=1, old_state=None, new_state=None, sample=None):
+    # 返回各输出的名字聚合，用 iter_outputs / expand_outputs 展开
+    # sample 为 (比例, 随机种子) 时只读取分层抽样的记录
+    filename = name + '.jsonlines'
+    if archive:
+        filepath, member = archive, find_archive_member(archive, filename)
+    else:
+        filepath, member = os.path.join(base_dir, filename), None
+    
+    total_bytes = n_lines = None
+    if PROFILER is not None:
+        total_bytes = dump_size(filepath, member)
+        if executor is not None and new_state is None and member is None:
+            # 子进程中读到的行数传不回来，预先数一遍（不计入阶段耗时）
+            n_lines = count_lines(filepath)
+    
+    with profile_stage('ingest:' + name, total_bytes) as stage:
+        if n_lines is not None:
+            stage.items_in = n_lines
+        if sample is not None:
+            outputs = sample_jsonlines(name, filepath, *sample)
+        elif new_state is not None:
+            outputs = load_jsonlines_incremental(name, filepath, old_state, new_state, member)
+        else:
+            outputs = load_jsonlines(name, filepath, executor, n_chunks, member)
+        stage.items_out = sum(len(names) for names in outputs)
+    if MALFORMED_LINES.get(filename):
+        print(f"  Skipped {MALFORMED_LINES[filename]} malformed lines")
+    return outputs
+
+# 阶段产物缓存：每个阶段的输出按 (阶段代码和配置, 输入, 上游产物摘要) 的哈希保存
+# 改动某个阶段只会让它和下游失效；最后的权重换算和写出每次都重新运行
+STAGE_CACHE_VERSION = 1
+# 每个阶段保留最近几份产物，便于在几组配置之间来回切换
+STAGE_CACHE_KEEP = 3
+# 各阶段依赖的函数、类和常量；函数和类按源码计入哈希
+STAGE_CODE = {
+    'ingest': ('DUMPS', 'NAME_RECORD_FIELDS', 'SUBJECT_RECORD_FIELDS', 'INFOBOX_KEYS', 'INFOBOX_LIST_KEYS',
+               'INFOBOX_ITEM_RE',
+               'CJK_CHAR_RE', 'DIGITS_RE', 'ENGLISH_WORD_RE', 'SINGLE_SURNAMES', 'DOUBLE_SURNAMES',
+               'read_dump', 'load_jsonlines', 'process_chunk', 'find_chunk_offsets', 'find_archive_member',
+               'load_jsonlines_incremental', 'process_jsonlines_incremental', 'RECORD_ID_RE',
+               'iter_jsonlines', '_iter_jsonlines', 'iter_zip_jsonlines', 'iter_records', 'count_malformed',
+               'aggregate_jsonlines', 'merge_names', 'decode_record', 'parse_infobox', '_infobox_fields',
+               'extract_chinese_name', 'extract_aliases', 'extract_nickname', 'is_valid_chinese_word',
+               'is_valid_english_word', 'is_surname', 'add_name'),
+    'merge': ('DUMPS', 'CHINESE_COLUMNS', 'ENGLISH_COLUMNS', 'SINGLE_SURNAMES', 'DOUBLE_SURNAMES', 'SURNAME_END',
+              'WeightTable', 'build_weight_table', 'translated_names', 'iter_outputs', 'iter_name_parts',
+              'segment_names', 'split_name', 'build_surname_trie', 'surname_trie', 'surname_set',
+              'is_valid_chinese_word', 'is_surname', 'add_name'),
+    'pinyin': ('CHINESE_COLUMNS', 'TONE_MAP', 'PINYIN_CACHE_FORMAT', 'get_syllables'),
+}
+
+def _fingerprint(h, obj):
+    while isinstance(obj, CountingPattern):
+        obj = obj.pattern
+    if inspect.isfunction(obj) or inspect.isclass(obj):
+        h.update(inspect.getsource(obj).encode('utf-8'))
+    elif isinstance(obj, re.Pattern):
+        h.update(obj.pattern.encode('utf-8'))
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            _fingerprint(h, key)
+            _fingerprint(h, value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            _fingerprint(h, item)
+    elif isinstance(obj, (set, frozenset)):
+        h.update(repr(sorted(obj)).encode('utf-8'))
+    else:
+        h.update(repr(obj).encode('utf-8'))
+
+def code_fingerprint(stage):
+    h = hashlib.blake2b(digest_size=16)
+    for name in STAGE_CODE[stage.partition(':')[0]]:
+        h.update(name.encode('utf-8'))
+        _fingerprint(h, globals()[name])
+    return h.hexdigest()
+
+def dump_source(name, base_dir, archive=None):
+    # 数据文件按 (路径, 大小, mtime) 识别，不为几 GB 的文件计算摘要
+    filename = name + '.jsonlines'
+    if archive:
+        path, member = os.path.abspath(archive), find_archive_member(archive, filename)
+    else:
+        path, member = os.path.abspath(os.path.join(base_dir, filename)), None
+    st = os.stat(path)
+    return {'path': path, 'member': member, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def merge_inputs(cache, ingest_keys, tables):
+    # 上游产物尚未缓存时摘要为 None，这样的键不会命中
+    return {
+        'ingest': {name: cache.digest(key) for name, key in ingest_keys.items()},
+        'side_tables': {name: tables.digests.get(name) for name in ('jp_surnames', 'split_names', 'jp_cn_translations')},
+    }
+
+class StageCache:
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.entries = {}
+        self.hits = []
+        self.misses = []
+        self.fingerprints = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == STAGE_CACHE_VERSION:
+                self.entries = manifest['entries']
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def key(self, stage, inputs):
+        if stage not in self.fingerprints:
+            self.fingerprints[stage] = code_fingerprint(stage)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.fingerprints[stage].encode('ascii'))
+        h.update(json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return f'{stage}@{h.hexdigest()}'
+    
+    def digest(self, key):
+        # 产物内容的摘要，供下游阶段计算键；不在缓存中时为 None
+        entry = self.entries.get(key)
+        return entry['digest'] if entry else None
+    
+    def path(self, key):
+        return os.path.join(self.directory, key.replace(':', '_').replace('@', '-') + '.pickle')
+    
+    def load(self, key):
+        stage = key.partition('@')[0]
+        entry = self.entries.get(key)
+        if entry is not None:
+            try:
+                with open(self.path(key), 'rb') as f:
+                    blob = f.read()
+                if hashlib.blake2b(blob, digest_size=16).hexdigest() == entry['digest']:
+                    with profile_stage('cache:' + stage):
+                        data = pickle.loads(blob)
+                    self.hits.append(stage)
+                    return data
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                pass
+            del self.entries[key]
+        self.misses.append(stage)
+        return None
+    
+    def store(self, key, data):
+        stage = key.partition('@')[0]
+        blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(blob)
+        os.replace(path + '.tmp', path)
+        self.entries[key] = {'digest': hashlib.blake2b(blob, digest_size=16).hexdigest(), 'stored': time.time()}
         
-        # 读取名字分离结果，为假名名字添加罗马音
-        for line in open(os.path.join(base_dir, 'names_splitted.txt'), 'r', encoding='utf-8'):
-            parts = line.strip().split('\t')
-            if len(parts) >= 3 and parts[1]:
-                name = parts[0]
-                # 只处理包含假名的名字
-                if re.search(r'[\u3040-\u309F\u30A0-\u30FF]', name):
-                    # 如果没有中文翻译，用罗马音
-                    if name not in JP_CN_TRANSLATIONS:
-                        romaji = kana_to_romaji(name)
-                        if romaji and romaji != name:
-                            jp_kana_words.append((name, romaji, 30))
-        
-        print(f"Added {len(jp_kana_words)} JP kana names with romaji")
-        all_words_list.extend(jp_kana_words)
-        
-        all_words_list.extend(KANA_ENTRIES)
-        print(f"Added {len(KANA_ENTRIES)} kana entries")
-        
-        all_words_list.extend(JP_KANJI_POLYPHONIC)
-        print(f"Added {len(JP_KANJI_POLYPHONIC)} Japanese kanji polyphonic entries")
-        
-        all_words_list.sort(key=lambda x: -x[2])
+        # 同一阶段只保留最近的 STAGE_CACHE_KEEP 份
+        same_stage = sorted((k for k in self.entries if k.partition('@')[0] == stage),
+                            key=lambda k: self.entries[k]['stored'], reverse=True)
+        for old_key in same_stage[STAGE_CACHE_KEEP:]:
+            del self.entries[old_key]
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
         
-        for word, pinyin, weight in all_words_list:
-            f.write(f"{word}\t{pinyin}\t{weight}\n")
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': STAGE_CACHE_VERSION, 'entries': self.entries}, f, indent=2)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+    
+    def summary(self):
+        parts = [f'{stage} hit' for stage in self.hits] + [f'{stage} rebuilt' for stage in self.misses]
+        return ', '.join(parts) if parts else 'nothing cached'
+
+def translated_names(translations):
+    # 日文翻译的中文名聚合：中文翻译 50，分词 20
+    names = {}
+    for jp_name, cn_name in translations.items():
+        if cn_name and is_valid_chinese_word(cn_name):
+            add_name(names, cn_name, 50, 20)
+    return names
+
+def build_weight_table(read_outputs, tables, counted=False):
+    # read_outputs(数据文件名) 返回该文件的名字聚合；依次分词累加到 WeightTable，最后加入日文翻译
+    table = WeightTable(CHINESE_COLUMNS + ENGLISH_COLUMNS, counted)
     
-    print(f"\nTotal Chinese words: {len(all_chinese_words)}")
-    print(f"Total English words: {len(all_english_words)}")
-    print(f"Total unique words: {len(all_words_list)}")
+    print("Processing character.jsonlines...")
+    outputs = read_outputs('character')
+    with profile_stage('split:character') as stage:
+        stage.items_in = len(outputs[0])
+        table.add('character', iter_outputs('character', outputs)[0])
+        table.mark_primary(outputs[0])
+        stage.items_out = table.count(['character'])
+    print(f"  Found {table.count(['character'])} words")
+    
+    print("Processing person.jsonlines...")
+    outputs = read_outputs('person')
+    with profile_stage('split:person') as stage:
+        stage.items_in = len(outputs[0])
+        table.add('person', iter_outputs('person', outputs)[0])
+        table.mark_primary(outputs[0])
+        stage.items_out = table.count(['person'])
+    print(f"  Found {table.count(['person'])} words")
+    
+    print("Processing subject.jsonlines...")
+    outputs = read_outputs('subject')
+    with profile_stage('split:subject') as stage:
+        stage.items_in = sum(len(names) for names in outputs)
+        subject_cn, subject_en = iter_outputs('subject', outputs)
+        table.add('subject_cn', subject_cn)
+        # 英文词的类别除数在换算权重时才用，这里存原始权重
+        table.add('subject_en', subject_en)
+        for names in outputs:
+            table.mark_primary(names)
+        stage.items_out = table.count(['subject_cn', 'subject_en'])
+    print(f"  Found {table.count(['subject_cn'])} Chinese words, {table.count(['subject_en'])} English words")
+    del outputs
+    
+    # 添加日文翻译
+    print(f"\nAdding {len(tables.jp_cn_translations)} JP-CN translations...")
+    with profile_stage('translations') as stage:
+        stage.items_in = len(tables.jp_cn_translations)
+        translations = translated_names(tables.jp_cn_translations)
+        table.add('translation', iter_name_parts(translations))
+        table.mark_primary(translations)
+        stage.items_out = table.count(['translation'])
+    return table
+
+# 常驻模式（--watch）：名字聚合、词频表和拼音编码留在内存中，轮询附加数据表
+# 有改动时只对分词结果可能变化的名字重新分词，更新相关词条后原子地重写词库
+WATCH_INTERVAL = 0.5
+# 需要分词的名字聚合：(数据文件, 第几个输出, WeightTable 的列)
+SPLIT_OUTPUTS = (('character', 0, 'character'), ('person', 0, 'person'), ('subject', 0, 'subject_cn'))
+
+def affected_names(names, changed_names, changed_surnames):
+    # 预分离结果有变化的名字，以及以变化的姓氏开头的名字；其余名字的分词不受影响
+    by_first = {}
+    for surname in changed_surnames:
+        by_first.setdefault(surname[0], []).append(surname)
+    for name in names:
+        if name in changed_names:
+            yield name
+            continue
+        surnames = by_first.get(name[:1])
+        if surnames and any(name.startswith(surname) for surname in surnames):
+            yield name
+
+def name_parts(parts, part_weight, allow_single):
+    # 与 iter_name_parts 相同的过滤，只给出分词部分
+    return [(part, part_weight) for part in parts if part and is_valid_chinese_word(part, allow_single=allow_single)]
+
+class ResidentBuild:
+    # 中文词条按词 id 存放格式化好的行和权重，附加数据表变化时只重算被改动的词
+    # 同权重词条的先后沿用启动时的词 id 顺序，新出现的词排在最后，
+    # 所以与完整重新生成相比，词条和权重相同，同权重词条的先后可能不同
+    def __init__(self, table, outputs, tables, kana_names_path, max_entries=None, english=None):
+        self.table = table
+        self.outputs = outputs
+        self.tables = tables
+        self.trie = surname_trie()
+        self.kana_names_path = kana_names_path
+        self.max_entries = max_entries
+        self.chinese_mask = sum(table.bits[name] for name in CHINESE_COLUMNS)
+        # 不收录的词权重记为 -1，排序后落在最后
+        self.lines = []
+        self.weights = array('q')
+        self.refresh(range(len(table)))
+        # 附加数据表不影响英文词，english 与 iter_dict_entries 的同名参数相同
+        if english is None:
+            english = table.totals(ENGLISH_COLUMNS)
+        self.english = [entry for entry in (english_entry(word, weight, ENGLISH_THRESHOLD)
+                                            for word, weight in english if word)
+                        if entry is not None]
+        self.kana_names = load_kana_names(kana_names_path)
+    
+    def refresh(self, ids):
+        table = self.table
+        columns = [table.columns[name] for name in CHINESE_COLUMNS]
+        present = table.present
+        mask = self.chinese_mask
+        lines = self.lines
+        scaled = self.weights
+        n_new = len(table) - len(lines)
+        lines.extend([None] * n_new)
+        scaled.extend([-1] * n_new)
+        for i in ids:
+            word = table.words[i]
+            if word and present[i] & mask:
+                weight = scale_weight(sum(weights[i] for weights in columns))
+                lines[i] = format_entry(word, get_pinyin(word), weight)
+                scaled[i] = weight
+            else:
+                lines[i] = None
+                scaled[i] = -1
+    
+    def update(self):
+        # 重新读入附加数据表并更新受影响的词条，返回 (重新分词的名字数, 重算的词数)
+        old_tables, old_trie = self.tables, self.trie
+        tables = load_side_tables(SIDE_TABLE_DIR)
+        changed_surnames = surname_set(old_tables) ^ surname_set(tables)
+        trie = build_surname_trie(surname_set(tables)) if changed_surnames else old_trie
+        old_overrides, overrides = old_tables.split_names, tables.split_names
+        changed_names = {name for name in old_overrides.keys() | overrides.keys()
+                         if old_overrides.get(name) != overrides.get(name)}
+    
+        table = self.table
+        touched = set()
+        n_names = 0
+        for dump, k, column in SPLIT_OUTPUTS:
+            names = self.outputs[dump][k]
+            allow_single = DUMPS[dump][2][k].get('allow_single', True)
+            removed = []
+            added = []
+            for name in affected_names(names, changed_names, changed_surnames):
+                old_parts = split_name(name, old_trie, old_overrides)
+                parts = split_name(name, trie, overrides)
+                if parts == old_parts:
+                    continue
+                n_names += 1
+                part_weight = names[name][1]
+                removed += name_parts(old_parts, part_weight, allow_single)
+                added += name_parts(parts, part_weight, allow_single)
+            table.remove(column, removed)
+            table.add(column, added)
+            touched.update(word for word, _ in removed)
+            touched.update(word for word, _ in added)
+    
+        # 日文翻译只有几千条，整列撤销后重新加入
+        old_translations = translated_names(old_tables.jp_cn_translations)
+        translations = translated_names(tables.jp_cn_translations)
+        removed = list(iter_name_parts(old_translations, trie=old_trie, overrides=old_overrides))
+        added = list(iter_name_parts(translations, trie=trie, overrides=overrides))
+        if removed != added:
+            table.remove('translation', removed)
+            table.add('translation', added)
+            table.mark_primary(translations)
+            touched.update(word for word, _ in removed)
+            touched.update(word for word, _ in added)
+    
+        self.tables, self.trie = tables, trie
+        replace_side_tables(tables, trie)
+        self.refresh(table.index[word] for word in touched)
+        self.kana_names = load_kana_names(self.kana_names_path)
+        return n_names, len(touched)
+    
+    def write(self, output_path):
+        # 词条顺序与 iter_dict_entries 相同，排序与 sort_entries 相同：按权重降序，同权重保持原顺序
+        tail = self.english + self.kana_names + KANA_ENTRIES + JP_KANJI_POLYPHONIC
+        lines = self.lines + [format_entry(*entry) for entry in tail]
+        weights = self.weights + array('q', (weight for _, _, weight in tail))
+        order = sorted(range(len(weights)), key=weights.__getitem__, reverse=True)
+        entry_count = len(lines) - self.lines.count(None)
+        if self.max_entries is not None:
+            entry_count = min(entry_count, self.max_entries)
+        # 先写临时文件再替换，输入法随时读到的都是完整的词库
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            write_dict_header(f, DICT_NAME)
+            write_lines(f, (lines[i] for i in order[:entry_count]))
+        os.replace(tmp_path, output_path)
+        return entry_count
+
+def stat_files(paths):
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats[path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stats[path] = None
+    return stats
+
+def watch(build, paths, output_path, interval=WATCH_INTERVAL):
+    # 轮询直到 Ctrl+C；文件在写入途中被读到时，写完后修改时间再次变化，会再更新一次
+    last = stat_files(paths)
+    print(f"\nWatching {', '.join(paths)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            stats = stat_files(paths)
+            if stats == last:
+                continue
+            changed = [os.path.basename(path) for path in paths if stats[path] != last[path]]
+            last = stats
+            start = time.perf_counter()
+            n_names, n_words = build.update()
+            entry_count = build.write(output_path)
+            print(f"[{time.strftime('%H:%M:%S')}] {', '.join(changed)} changed: {n_names} names re-split, "
+                  f"{n_words} words updated, {entry_count} entries written in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print()
+
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+def parse_size(value):
+    # '2M' -> 2097152
+    unit = SIZE_UNITS.get(value[-1:].upper())
+    try:
+        return int(float(value[:-1]) * unit) if unit else int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid size: {value}')
+
+def parse_fraction(value):
+    # '1%' -> 0.01
+    try:
+        fraction = float(value[:-1]) / 100 if value.endswith('%') else float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid fraction: {value}')
+    if not 0 < fraction <= 1:
+        raise argparse.ArgumentTypeError(f'fraction must be in (0, 1]: {value}')
+    return fraction
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Convert Bangumi Archive dumps to a Rime dictionary')
+    parser.add_argument('--base-dir', default=r"C:\Users\feohz\Documents\bagumi_local",
+                        help='directory containing the extracted *.jsonlines dumps')
+    parser.add_argument('--archive', default=None,
+                        help='read the dumps directly from a Bangumi Archive zip instead of <base-dir>')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes for parsing the dumps (default: 1, '
+                             'ignored with --archive)')
+    parser.add_argument('--json-backend', default='auto', choices=['auto', 'orjson', 'json'],
+                        help='JSON decoder for the dumps (default: orjson if installed, else json)')
+    parser.add_argument('--pinyin-cache', default=None,
+                        help='pinyin cache file (default: <base-dir>/pinyin_cache.json)')
+    parser.add_argument('--no-pinyin-cache', action='store_true',
+                        help='do not read or write the pinyin cache')
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse per-record results from the previous run and only reparse '
+                             'added or changed records (ignores --jobs)')
+    parser.add_argument('--state', default=None,
+                        help='incremental state file (default: <base-dir>/incremental_state.pickle)')
+    parser.add_argument('--weight-config', default=None,
+                        help='JSON file overriding the weight rules (scale_breakpoints, english_divisors, '
+                             'english_threshold, kana_name_weight), e.g. exported by tune_weights.py')
+    parser.add_argument('--stage-cache', action='store_true',
+                        help='cache the parsed dumps, merged weights and pinyin codes, and rerun only the '
+                             'stages whose code, settings or inputs changed')
+    parser.add_argument('--cache-dir', default=None,
+                        help='directory for --stage-cache (default: <base-dir>/stage_cache)')
+    parser.add_argument('--max-entries', type=int, default=None,
+                        help='only write the N highest-weighted entries (heap-based top-K)')
+    parser.add_argument('--sort-budget', type=int, default=None,
+                        help='keep at most N entries in memory while sorting; '
+                             'larger outputs are sorted in runs on disk and merged')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='directory for --sort-budget runs (default: system temp dir)')
+    parser.add_argument('--shards', action='store_true',
+                        help='write one dictionary per category (characters, persons, subjects, english, '
+                             'kana, kanji) plus a bangumi.dict.yaml that imports them all')
+    parser.add_argument('--shards-dir', default=None,
+                        help='output directory for --shards (default: <base-dir>/shards)')
+    parser.add_argument('--measure-deploy', action='store_true',
+                        help='time a Rime compile using rime_deployer: of each shard with --shards, otherwise '
+                             'of the output against a default build (no --merge-english, joined codes)')
+    parser.add_argument('--rime-deployer', default='rime_deployer',
+                        help='rime_deployer executable for --measure-deploy (default: rime_deployer on PATH)')
+    parser.add_argument('--crowding', action='store_true',
+                        help='report how many candidates share each code and list the most crowded codes')
+    parser.add_argument('--crowding-report', default=None,
+                        help='JSON file for the --crowding report (default: <base-dir>/crowding_report.json)')
+    parser.add_argument('--max-per-code', type=int, default=None,
+                        help='keep at most N candidates per code, dropping entries that only come from '
+                             'splitting names first, then the lowest weights (implies --crowding)')
+    parser.add_argument('--syllable-codes', action='store_true',
+                        help='write pinyin codes with a space between syllables (mao yu na) so Rime does not '
+                             'have to re-segment them at deploy time')
+    parser.add_argument('--initials', action='store_true',
+                        help='add a stem column with the syllable initials (myn) to multi-syllable entries, '
+                             'for dict_query.py --initials; Rime only reads stems when encoding new phrases, so '
+                             'this does not enable initials-only typing (implies --syllable-codes)')
+    parser.add_argument('--merge-english', action='store_true',
+                        help='merge English entries that differ only in case, spacing, dots or hyphens into the '
+                             'most weighted spelling, summing their weights')
+    parser.add_argument('--budget-entries', type=int, default=None,
+                        help='keep at most N entries, choosing the highest weights after --budget-min')
+    parser.add_argument('--budget-bytes', type=parse_size, default=None,
+                        help='keep the dictionary under this size (e.g. 2M, 500K), choosing entries '
+                             'by weight per byte after --budget-min')
+    parser.add_argument('--budget-min', action='append', default=[], metavar='SHARD=N',
+                        help='always keep the N highest-weighted entries of a shard (or SHARD=all), '
+                             'may be repeated (default: kana=all, kanji=all)')
+    parser.add_argument('--budget-report', default=None,
+                        help='JSON report of kept and dropped entries per shard '
+                             '(default: <base-dir>/budget_report.json)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep the build in memory, watch the side tables (names_splitted.txt, '
+                             'jp_cn_translations.txt, japanese_surnames.txt) and rewrite the dictionary '
+                             'after each edit, updating only the affected entries')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                        help=f'seconds between checks for --watch (default: {WATCH_INTERVAL})')
+    parser.add_argument('--sample', type=parse_fraction, default=None, metavar='FRACTION',
+                        help='preview build from a sample of the records (e.g. 0.01 or 1%%), stratified by '
+                             'popularity using a line index kept next to each dump; writes '
+                             f'{DICT_NAME}.sample.dict.yaml (ignores --jobs)')
+    parser.add_argument('--sample-seed', type=int, default=0,
+                        help='random seed for --sample (default: 0)')
+    parser.add_argument('--profile', action='store_true',
+                        help='report per-stage wall time, throughput, peak memory, regex calls and '
+                             'item counts, with live progress on a terminal')
+    parser.add_argument('--profile-report', default=None,
+                        help='JSON file for the --profile report (default: <base-dir>/profile_report.json)')
+    args = parser.parse_args()
+    if args.sort_budget is not None and args.sort_budget < 1:
+        parser.error('--sort-budget must be at least 1')
+    if args.shards and (args.max_entries is not None or args.sort_budget is not None):
+        parser.error('--shards cannot be combined with --max-entries or --sort-budget')
+    args.budget = args.budget_entries is not None or args.budget_bytes is not None
+    if args.budget_entries is not None and args.budget_bytes is not None:
+        parser.error('use only one of --budget-entries and --budget-bytes')
+    if args.budget and (args.shards or args.max_entries is not None or args.sort_budget is not None):
+        parser.error('--budget-entries/--budget-bytes cannot be combined with --shards, '
+                     '--max-entries or --sort-budget')
+    if args.watch and (args.shards or args.budget or args.crowding or args.max_per_code is not None
+                       or args.sort_budget is not None):
+        parser.error('--watch cannot be combined with --shards, --budget-entries/--budget-bytes, '
+                     '--crowding, --max-per-code or --sort-budget')
+    if args.sample is not None and (args.archive or args.incremental or args.stage_cache or args.shards
+                                    or args.watch or args.measure_deploy):
+        parser.error('--sample cannot be combined with --archive, --incremental, --stage-cache, --shards, '
+                     '--watch or --measure-deploy')
+    try:
+        args.budget_min = parse_budget_minimums(args.budget_min)
+    except ValueError as e:
+        parser.error(f'--budget-min: {e}')
+    return args
+
+def main():
+    args = parse_args()
+    base_dir = args.base_dir
+    set_json_backend(args.json_backend)
+    print(f"Using {JSON_BACKEND} JSON backend")
+    if args.weight_config:
+        try:
+            load_weight_config(args.weight_config)
+        except (OSError, ValueError) as e:
+            sys.exit(f'--weight-config: {e}')
+        print(f"Using weight rules from {args.weight_config}")
+    set_code_format(args.syllable_codes, args.initials)
+    if args.profile:
+        enable_profiler()
+    
+    tables = side_tables()
+    print(f'Loaded {len(tables.jp_surnames)} Japanese surnames')
+    print(f'Loaded {len(tables.split_names)} pre-split names')
+    print(f'Loaded {len(tables.jp_cn_translations)} JP-CN translations')
+    
+    executor = None
+    n_chunks = 1
+    old_state = None
+    incremental_state = None
+    if args.incremental:
+        state_path = args.state or os.path.join(base_dir, 'incremental_state.pickle')
+        old_state = load_incremental_state(state_path)
+        incremental_state = {}
+    elif args.jobs > 1 and not args.archive and args.sample is None:
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=set_json_backend,
+                                       initargs=(JSON_BACKEND,))
+        # 多切几块，避免个别分块拖慢整体
+        n_chunks = args.jobs * 4
+    
+    cache = None
+    if args.stage_cache:
+        cache = StageCache(args.cache_dir or os.path.join(base_dir, 'stage_cache'))
+        ingest_keys = {name: cache.key('ingest:' + name, dump_source(name, base_dir, args.archive))
+                       for name in DUMPS}
+    
+    def read(name):
+        if cache is not None:
+            outputs = cache.load(ingest_keys[name])
+            if outputs is not None:
+                print("  Loaded from stage cache")
+                if incremental_state is not None:
+                    incremental_state[name] = old_state.get(name, {})
+                return outputs
+        sample = None if args.sample is None else (args.sample, args.sample_seed)
+        outputs = read_dump(name, base_dir, args.archive, executor, n_chunks, old_state, incremental_state, sample)
+        if cache is not None:
+            cache.store(ingest_keys[name], outputs)
+        return outputs
+    
+    # 常驻模式要保留名字聚合，并且每次都重新建可撤销的词频表
+    resident_outputs = {}
+    
+    def keep(name):
+        resident_outputs[name] = read(name)
+        return resident_outputs[name]
+    
+    table = None
+    if cache is not None and not args.watch:
+        merge_key = cache.key('merge', merge_inputs(cache, ingest_keys, tables))
+        table = cache.load(merge_key)
+        if table is not None:
+            print(f"Loaded {len(table)} merged words from stage cache")
+            if incremental_state is not None:
+                # 没有读取数据文件，沿用上次的增量状态
+                incremental_state.update(old_state)
+    if table is None:
+        table = build_weight_table(keep if args.watch else read, tables, counted=args.watch)
+        if cache is not None:
+            # 上游产物刚刚写入，按它们的实际摘要重新计算键
+            merge_key = cache.key('merge', merge_inputs(cache, ingest_keys, tables))
+            cache.store(merge_key, table)
+    if incremental_state is not None:
+        save_incremental_state(state_path, incremental_state)
+        del old_state, incremental_state
+    if executor is not None:
+        executor.shutdown()
+    
+    pinyin_cache_path = None
+    if not args.no_pinyin_cache:
+        pinyin_cache_path = args.pinyin_cache or os.path.join(base_dir, 'pinyin_cache.json')
+        print(f"\nLoaded {load_pinyin_cache(pinyin_cache_path)} cached pinyin codes")
+    
+    if cache is not None:
+        pinyin_key = cache.key('pinyin', {'merge': cache.digest(merge_key), 'pypinyin': pinyin_cache_key()})
+        codes = cache.load(pinyin_key)
+        if codes is None:
+            with profile_stage('pinyin') as stage:
+                codes = {word: get_syllables(word) for word, _ in table.totals(CHINESE_COLUMNS) if word}
+                stage.items_in = stage.items_out = len(codes)
+            cache.store(pinyin_key, codes)
+        PINYIN_CACHE.update(codes)
+        del codes
+        print(f"Stage cache: {cache.summary()}")
+    
+    print(f"\nScaling weights and writing output...")
+    
+    # 抽样构建写到单独的词库，不覆盖完整构建；表头的 name 须与文件名一致，所以 --sample 1 也只有词条与完整构建相同
+    dict_name = DICT_NAME if args.sample is None else DICT_NAME + '.sample'
+    output_path = os.path.join(base_dir, dict_name + '.dict.yaml')
+    
+    english = None
+    english_merge = None
+    if args.merge_english:
+        with profile_stage('merge_english') as stage:
+            pairs = [(word, weight) for word, weight in table.totals(ENGLISH_COLUMNS) if word]
+            english, variants = merge_english_variants(pairs)
+            english_merge = english_merge_report(pairs, english, variants)
+            stage.items_in = len(pairs)
+            stage.items_out = len(english)
+        del pairs, variants
+    
+    if args.watch:
+        kana_names_path = os.path.join(base_dir, 'names_splitted.txt')
+        build = ResidentBuild(table, resident_outputs, tables, kana_names_path, args.max_entries, english)
+        print(f"Total unique words: {build.write(output_path)}")
+        print(f"Output saved to: {output_path}")
+        paths = [os.path.join(SIDE_TABLE_DIR, filename) for filename in SIDE_TABLE_FILES.values()]
+        paths = list(dict.fromkeys(os.path.abspath(path) for path in paths + [kana_names_path]))
+        watch(build, paths, output_path, args.watch_interval)
+        if pinyin_cache_path and PINYIN_CACHE_STATS['misses']:
+            save_pinyin_cache(pinyin_cache_path)
+        return
+    
+    kana_names = load_kana_names(os.path.join(base_dir, 'names_splitted.txt'))
+    print(f"Added {len(kana_names)} JP kana names with romaji")
+    print(f"Added {len(KANA_ENTRIES)} kana entries")
+    print(f"Added {len(JP_KANJI_POLYPHONIC)} Japanese kanji polyphonic entries")
+    
+    crowding = args.crowding or args.max_per_code is not None
+    tagged = args.shards or args.budget
+    entries = iter_dict_entries(table, kana_names, shards=tagged or crowding, english=english)
+    if PROFILER is not None and cache is None:
+        # 拼音和权重换算在排序读取词条时惰性进行，单独计时
+        n_candidates = len(table) + len(kana_names) + len(KANA_ENTRIES) + len(JP_KANJI_POLYPHONIC)
+        entries = PROFILER.timed('pinyin', entries, items_total=n_candidates)
+    
+    crowding_report = None
+    if crowding:
+        with profile_stage('crowding') as stage:
+            entries, crowding_report = cap_candidates(entries, args.max_per_code, table.is_part)
+            stage.items_in = crowding_report['entries']
+            stage.items_out = len(entries)
+        if not tagged:
+            entries = (entry for _, entry in entries)
+    
+    shards = None
+    budget_report = None
+    if args.budget:
+        header = io.StringIO()
+        write_dict_header(header, dict_name)
+        max_bytes = None
+        if args.budget_bytes is not None:
+            max_bytes = args.budget_bytes - len(header.getvalue().encode('utf-8'))
+        with profile_stage('budget') as stage:
+            entries, budget_report = select_budget(entries, args.budget_entries, max_bytes, args.budget_min)
+            stage.items_in = sum(stats['kept'] + stats['dropped'] for stats in budget_report['shards'].values())
+            stage.items_out = len(entries)
+        with profile_stage('sort_write') as write_stage, \
+                open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(header.getvalue())
+            entry_count = write_lines(f, sort_entries(entries))
+            write_stage.items_in = write_stage.items_out = entry_count
+        del entries
+    elif args.shards:
+        output_path = args.shards_dir or os.path.join(base_dir, 'shards')
+        with profile_stage('sort_write') as write_stage:
+            shards = write_shards(output_path, entries)
+            entry_count = sum(count for _, count, _ in shards.values())
+            write_stage.items_in = write_stage.items_out = entry_count
+    else:
+        with profile_stage('sort_write') as write_stage, \
+                open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            write_dict_header(f, dict_name)
+            entry_count = write_lines(f, sort_entries(entries, args.max_entries, args.sort_budget, args.tmp_dir))
+            write_stage.items_in = write_stage.items_out = entry_count
+    
+    print(f"Pinyin cache: {PINYIN_CACHE_STATS['hits']} hits, {PINYIN_CACHE_STATS['misses']} misses")
+    if pinyin_cache_path and PINYIN_CACHE_STATS['misses']:
+        save_pinyin_cache(pinyin_cache_path)
+    
+    print(f"\nTotal Chinese words: {table.count(CHINESE_COLUMNS)}")
+    print(f"Total English words: {table.count(ENGLISH_COLUMNS)}")
+    print(f"Total unique words: {entry_count}")
+    
+    # 只有输出包含全部词条时，与默认构建的总数和编译耗时才可比
+    complete = not (args.budget or args.max_entries is not None or args.max_per_code is not None)
+    if english_merge is not None:
+        print_english_merge_report(english_merge)
+        if complete:
+            print(f"Total entries: {entry_count + english_merge['entries_before'] - english_merge['entries_after']}"
+                  f" -> {entry_count}")
+    
+    if args.measure_deploy and complete and shards is None:
+        deployer = shutil.which(args.rime_deployer)
+        if deployer is None:
+            print(f"\n{args.rime_deployer} not found, deploy time not measured")
+        else:
+            times = measure_default_deploy(output_path, table, kana_names, deployer)
+            before, after = (f"{seconds:.2f}s" if seconds is not None else 'failed' for seconds in times)
+            print(f"\nDeploy time: {before} (default build) -> {after} (this build)")
+    
+    if crowding_report is not None:
+        print_crowding_report(crowding_report)
+        report_path = args.crowding_report or os.path.join(base_dir, 'crowding_report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(crowding_report, f, ensure_ascii=False, indent=2)
+        print(f"Crowding report saved to: {report_path}")
+    
+    if budget_report is not None:
+        print_budget_report(budget_report)
+        report_path = args.budget_report or os.path.join(base_dir, 'budget_report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(budget_report, f, ensure_ascii=False, indent=2)
+        print(f"Budget report saved to: {report_path}")
+    
+    if shards is not None:
+        deploy_times = {}
+        if args.measure_deploy:
+            deployer = shutil.which(args.rime_deployer)
+            if deployer is None:
+                print(f"\n{args.rime_deployer} not found, deploy time not measured")
+            else:
+                names = [name for name, _, _ in shards.values()] + [DICT_NAME]
+                deploy_times = measure_rime_deploy(output_path, names, deployer)
+        
+        print(f"\n{'shard':<30}{'entries':>10}{'KB':>10}{'deploy s':>10}")
+        for name, count, size in shards.values():
+            seconds = deploy_times.get(name)
+            deploy = f"{seconds:.2f}" if seconds is not None else '-'
+            print(f"{name + '.dict.yaml':<30}{count:>10}{size / 1024:>10.0f}{deploy:>10}")
+        if deploy_times.get(DICT_NAME) is not None:
+            print(f"{'all (import_tables)':<30}{entry_count:>10}{'':>10}{deploy_times[DICT_NAME]:>10.2f}")
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"Peak RSS: {rss:.1f} MB")
     print(f"Output saved to: {output_path}")
+    
+    if PROFILER is not None:
+        report_path = args.profile_report or os.path.join(base_dir, 'profile_report.json')
+        report = PROFILER.report(argv=sys.argv[1:], json_backend=JSON_BACKEND, entries=entry_count)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Profile report saved to: {report_path}")
 
 if __name__ == '__main__':
     main()
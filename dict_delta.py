@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import json
+import sys
+import time
+
+# 两版词库之间的差异：新增、删除、改权重的词条，发布说明用的统计，
+# 以及可以在旧文件上还原出新文件的增量补丁
+#
+# 补丁格式（按行，二进制安全）：
+#   #bangumi-delta 1 <旧文件摘要> <新文件摘要>
+#   =<起始行> <行数>      从旧文件复制连续的若干行
+#   +<原样的一行>          新文件中的一行
+
+PATCH_MAGIC = b'#bangumi-delta'
+PATCH_VERSION = 1
+HEADER_END = b'...'
+# 词条按列数解析：词、编码[、权重[、声母缩写]]；没有权重的词条按权重 0 计
+MISSING_WEIGHT = b'0'
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class DictFile:
+    # 整个文件按行读入（保留换行符），词条部分按 "词<Tab>编码" 建散列索引，值为权重的原始字节
+    # 声母缩写列（--initials）由编码决定，不参与比较
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.path = path
+        self.digest = digest(data)
+        self.lines = data.splitlines(keepends=True)
+        self.header_lines = 0
+        for i, line in enumerate(self.lines):
+            if line.rstrip(b'\r\n') == HEADER_END:
+                self.header_lines = i + 1
+                break
+        self.entries = entries = {}
+        for line in self.lines[self.header_lines:]:
+            if line.startswith(b'#'):
+                continue
+            fields = line.rstrip(b'\r\n').split(b'\t')
+            if len(fields) < 2:
+                continue
+            weight = fields[2] if len(fields) > 2 and fields[2] else MISSING_WEIGHT
+            entries[fields[0] + b'\t' + fields[1]] = weight
+
+def diff_entries(old, new):
+    # 返回 (新增, 删除, 改权重)；新增和删除为 [(键, 权重)]，改权重为 [(键, 旧权重, 新权重)]
+    old_entries = old.entries
+    new_entries = new.entries
+    added = [(key, int(weight)) for key, weight in new_entries.items() if key not in old_entries]
+    removed = [(key, int(weight)) for key, weight in old_entries.items() if key not in new_entries]
+    reweighted = []
+    for key, weight in new_entries.items():
+        old_weight = old_entries.get(key, weight)
+        if old_weight != weight:
+            reweighted.append((key, int(old_weight), int(weight)))
+    return added, removed, reweighted
+
+def make_patch(old, new):
+    # 逐行扫描新文件：能接上旧文件下一行就延长复制段，否则查索引开新的复制段，查不到则原样写入
+    old_lines = old.lines
+    n_old = len(old_lines)
+    # 倒序建表，重复的行留下最靠前的位置
+    first_line = dict(zip(reversed(old_lines), range(n_old - 1, -1, -1)))
+
+    ops = [b'%s %d %s %s\n' % (PATCH_MAGIC, PATCH_VERSION, old.digest.encode(), new.digest.encode())]
+    start = end = None
+    for line in new.lines:
+        if end is not None and end < n_old and old_lines[end] == line:
+            end += 1
+            continue
+        if end is not None:
+            ops.append(b'=%d %d\n' % (start, end - start))
+            start = end = None
+        i = first_line.get(line)
+        if i is None:
+            ops.append(b'+' + line)
+        else:
+            start, end = i, i + 1
+    if end is not None:
+        ops.append(b'=%d %d\n' % (start, end - start))
+    return b''.join(ops)
+
+def apply_patch(old_data, patch):
+    # 返回还原出的新文件内容；摘要不符时抛出 ValueError
+    ops = patch.splitlines(keepends=True)
+    if not ops:
+        raise ValueError('empty patch')
+    magic, version, old_digest, new_digest = ops[0].split()
+    if magic != PATCH_MAGIC or int(version) != PATCH_VERSION:
+        raise ValueError('not a bangumi dictionary delta')
+    if digest(old_data) != old_digest.decode():
+        raise ValueError('patch was made against a different base file')
+
+    old_lines = old_data.splitlines(keepends=True)
+    out = []
+    for op in ops[1:]:
+        if op[:1] == b'+':
+            out.append(op[1:])
+        elif op[:1] == b'=':
+            start, count = map(int, op[1:].split())
+            out.extend(old_lines[start:start + count])
+        else:
+            raise ValueError(f'bad patch line: {op[:40]!r}')
+    data = b''.join(out)
+    if digest(data) != new_digest.decode():
+        raise ValueError('patched file does not match the expected digest')
+    return data
+
+def summarize(old, new, added, removed, reweighted, top=10):
+    def entry(key, weight):
+        word, _, code = key.decode('utf-8').partition('\t')
+        return {'word': word, 'code': code, 'weight': weight}
+
+    by_change = sorted(reweighted, key=lambda item: abs(item[2] - item[1]), reverse=True)
+    return {
+        'old': {'path': old.path, 'entries': len(old.entries), 'digest': old.digest},
+        'new': {'path': new.path, 'entries': len(new.entries), 'digest': new.digest},
+        'added': len(added),
+        'removed': len(removed),
+        'reweighted': len(reweighted),
+        'weight_up': sum(1 for _, old_weight, weight in reweighted if weight > old_weight),
+        'weight_down': sum(1 for _, old_weight, weight in reweighted if weight < old_weight),
+        'header_changed': old.lines[:old.header_lines] != new.lines[:new.header_lines],
+        'top_added': [entry(key, weight) for key, weight in sorted(added, key=lambda item: item[1], reverse=True)[:top]],
+        'top_removed': [entry(key, weight) for key, weight in sorted(removed, key=lambda item: item[1], reverse=True)[:top]],
+        'top_reweighted': [dict(entry(key, weight), old_weight=old_weight) for key, old_weight, weight in by_change[:top]],
+    }
+
+def changelog_lines(stats):
+    lines = [f"- Dictionary: {stats['new']['entries']:,} entries "
+             f"({stats['new']['entries'] - stats['old']['entries']:+,}); "
+             f"{stats['added']:,} added, {stats['removed']:,} removed, {stats['reweighted']:,} reweighted "
+             f"({stats['weight_up']:,} up, {stats['weight_down']:,} down)"]
+    if stats['top_added']:
+        lines.append('- New: ' + ', '.join(e['word'] for e in stats['top_added']))
+    if stats['top_removed']:
+        lines.append('- Removed: ' + ', '.join(e['word'] for e in stats['top_removed']))
+    return lines
+
+def write_entries(path, added, removed, reweighted):
+    # 每行：+/-/~ <Tab> 词 <Tab> 编码 <Tab> 权重（改权重为旧权重 <Tab> 新权重）
+    with open(path, 'wb') as f:
+        f.writelines(b'+\t%s\t%d\n' % (key, weight) for key, weight in added)
+        f.writelines(b'-\t%s\t%d\n' % (key, weight) for key, weight in removed)
+        f.writelines(b'~\t%s\t%d\t%d\n' % (key, old_weight, weight) for key, old_weight, weight in reweighted)
+
+def cmd_diff(args):
+    start = time.perf_counter()
+    old = DictFile(args.old)
+    new = DictFile(args.new)
+    added, removed, reweighted = diff_entries(old, new)
+    patch = make_patch(old, new) if args.patch else None
+    seconds = time.perf_counter() - start
+
+    stats = summarize(old, new, added, removed, reweighted, args.top)
+    if patch is not None:
+        with open(args.patch, 'wb') as f:
+            f.write(patch)
+        stats['patch_bytes'] = len(patch)
+    if args.entries:
+        write_entries(args.entries, added, removed, reweighted)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    print(f"{args.old}: {stats['old']['entries']} entries")
+    print(f"{args.new}: {stats['new']['entries']} entries")
+    print(f"Added {stats['added']}, removed {stats['removed']}, reweighted {stats['reweighted']} "
+          f"({stats['weight_up']} up, {stats['weight_down']} down)"
+          + (', header changed' if stats['header_changed'] else ''))
+    if patch is not None:
+        print(f"Patch: {args.patch} ({len(patch) / 1024:.0f} KB)")
+    print(f"Compared in {seconds:.3f}s")
+    if args.changelog:
+        print()
+        print('\n'.join(changelog_lines(stats)))
+    return 0
+
+def cmd_apply(args):
+    with open(args.old, 'rb') as f:
+        old_data = f.read()
+    with open(args.patch, 'rb') as f:
+        patch = f.read()
+    try:
+        data = apply_patch(old_data, patch)
+    except ValueError as e:
+        print(f'{args.patch}: {e}', file=sys.stderr)
+        return 1
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f"Output saved to: {args.output}")
+    return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare two bangumi.dict.yaml builds and make or apply a delta patch')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    diff = sub.add_parser('diff', help='compare two builds')
+    diff.add_argument('old', help='previous bangumi.dict.yaml')
+    diff.add_argument('new', help='new bangumi.dict.yaml')
+    diff.add_argument('--patch', default=None, help='write a delta patch that turns OLD into NEW')
+    diff.add_argument('--entries', default=None,
+                      help='write added (+), removed (-) and reweighted (~) entries to this file')
+    diff.add_argument('--json', default=None, help='write the summary statistics as JSON')
+    diff.add_argument('--changelog', action='store_true', help='print summary lines for CHANGELOG.md')
+    diff.add_argument('--top', type=int, default=10,
+                      help='number of top added/removed/reweighted entries in the summary (default: 10)')
+    diff.set_defaults(func=cmd_diff)
+
+    apply = sub.add_parser('apply', help='rebuild the new file from the previous one and a patch')
+    apply.add_argument('old', help='previous bangumi.dict.yaml')
+    apply.add_argument('patch', help='patch made by "diff --patch"')
+    apply.add_argument('-o', '--output', required=True, help='where to write the rebuilt dictionary')
+    apply.set_defaults(func=cmd_apply)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
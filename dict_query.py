@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import heapq
+import mmap
+import os
+import pickle
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# 按编码前缀查询生成的词库：词库文件用 mmap 映射，索引是按 (编码, 行位置) 排序的编码和行偏移
+# 词库本身按权重降序排列，所以行偏移越小权重越高，同一前缀内取前 N 条就是取最小的 N 个偏移
+# 匹配条数很多的短前缀预先算好前 TOP_CACHE_SIZE 条
+#
+# 索引缓存在 <词库>.idx，按词库的 (mtime_ns, 大小, blake2b 摘要) 判断是否失效
+#
+# 编码中音节之间的空格（--syllable-codes）不计入索引，查询时按连续键入的字母匹配；
+# initials 为真时改为索引 --initials 写出的声母缩写列（没有这一列的词条不参与），索引缓存在 <词库>.initials.idx
+# 这只是离线检查：Rime 不按 stem 列匹配输入，实际的简拼由输入方案的 abbrev 规则决定
+
+INDEX_SUFFIX = '.idx'
+INITIALS_INDEX_SUFFIX = '.initials.idx'
+INDEX_VERSION = 2
+CODE_COLUMN = 1
+STEM_COLUMN = 3
+HEADER_END = b'\n...\n'
+# UTF-8 中不会出现 0xff，它比任何编码字节都大，用于求前缀范围的上界
+PREFIX_END = b'\xff'
+TOP_CACHE_MIN_RANGE = 512
+TOP_CACHE_SIZE = 64
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.digest()
+
+def build_index(mm, column=CODE_COLUMN):
+    # 返回 (排好序的编码, 对应的行偏移, {前缀: (全部匹配的前 N 个偏移, 不含完全匹配的前 N 个偏移)})
+    header_end = mm.find(HEADER_END)
+    pos = 0 if header_end < 0 else header_end + len(HEADER_END)
+    keyed = []
+    size = len(mm)
+    while pos < size:
+        end = mm.find(b'\n', pos)
+        if end < 0:
+            end = size
+        fields = mm[pos:end].rstrip(b'\r').split(b'\t')
+        if len(fields) >= 3 and len(fields) > column:
+            keyed.append((fields[column].replace(b' ', b''), pos))
+        pos = end + 1
+    keyed.sort()
+    codes = [code for code, _ in keyed]
+    offsets = array('q', (offset for _, offset in keyed))
+    return codes, offsets, build_top_cache(codes, offsets)
+
+def build_top_cache(codes, offsets):
+    # 逐级加长前缀，只为匹配超过 TOP_CACHE_MIN_RANGE 条的前缀算前 N 条
+    top = {}
+    ranges = [(b'', 0, len(codes))]
+    while ranges:
+        next_ranges = []
+        for prefix, lo, hi in ranges:
+            if hi - lo < TOP_CACHE_MIN_RANGE:
+                continue
+            exact_hi = bisect_right(codes, prefix, lo, hi)
+            if prefix:
+                top[prefix] = (array('q', heapq.nsmallest(TOP_CACHE_SIZE, offsets[lo:hi])),
+                               array('q', heapq.nsmallest(TOP_CACHE_SIZE, offsets[exact_hi:hi])))
+            i = exact_hi
+            depth = len(prefix) + 1
+            while i < hi:
+                child = codes[i][:depth]
+                j = bisect_left(codes, child + PREFIX_END, i, hi)
+                next_ranges.append((child, i, j))
+                i = j
+        ranges = next_ranges
+    return top
+
+class DictIndex:
+    def __init__(self, path, index_path=None, rebuild=False, initials=False):
+        self.path = path
+        self.column = STEM_COLUMN if initials else CODE_COLUMN
+        self.index_path = index_path or path + (INITIALS_INDEX_SUFFIX if initials else INDEX_SUFFIX)
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.rebuilt = False
+        self.stale = False
+        saved = None if rebuild else self.load_index()
+        if saved is None:
+            saved = build_index(self.mm, self.column)
+            self.rebuilt = True
+        self.codes, self.offsets, self.top = saved
+        if self.rebuilt or self.stale:
+            self.save_index()
+
+    def source_key(self, digest=None):
+        st = os.fstat(self.file.fileno())
+        return (st.st_mtime_ns, st.st_size, digest)
+
+    def load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if saved.get('version') != INDEX_VERSION:
+            return None
+        mtime_ns, size, digest = saved['source']
+        if (mtime_ns, size) != self.source_key()[:2]:
+            # 只是 mtime 变了而内容相同时沿用索引，并更新记录的 mtime
+            if digest != file_digest(self.path):
+                return None
+            self.stale = True
+        return saved['codes'], saved['offsets'], saved['top']
+
+    def save_index(self):
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': INDEX_VERSION, 'source': self.source_key(file_digest(self.path)),
+                             'codes': self.codes, 'offsets': self.offsets, 'top': self.top},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # 目录不可写时只是下次要重新建索引
+            pass
+
+    def entry_at(self, offset):
+        end = self.mm.find(b'\n', offset)
+        line = self.mm[offset:end if end >= 0 else len(self.mm)].rstrip(b'\r')
+        word, code, weight = line.decode('utf-8').split('\t')[:3]
+        return word, code, int(weight)
+
+    def top_offsets(self, lo, hi, limit, cached=None):
+        # 区间 [lo, hi) 中最小的 limit 个行偏移，升序；cached 是该区间预先算好的前 TOP_CACHE_SIZE 个
+        if limit is None:
+            return sorted(self.offsets[lo:hi])
+        if cached is not None and limit <= TOP_CACHE_SIZE:
+            return cached[:limit]
+        return heapq.nsmallest(limit, self.offsets[lo:hi])
+
+    def query(self, prefix, limit=None, exact_first=True):
+        # 返回 [(词, 编码, 权重)]：编码完全匹配的在前，其余以 prefix 开头的补全在后，各自按权重降序
+        key = prefix.replace(' ', '').encode('utf-8')
+        codes = self.codes
+        lo = bisect_left(codes, key)
+        hi = bisect_left(codes, key + PREFIX_END, lo)
+        cached_all, cached_completions = self.top.get(key, (None, None))
+        if exact_first:
+            exact_hi = bisect_right(codes, key, lo, hi)
+            found = self.top_offsets(lo, exact_hi, limit)
+            if limit is None or len(found) < limit:
+                rest = None if limit is None else limit - len(found)
+                found = list(found) + list(self.top_offsets(exact_hi, hi, rest, cached_completions))
+        else:
+            found = self.top_offsets(lo, hi, limit, cached_all)
+        return [self.entry_at(offset) for offset in found]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_queries(path):
+    # 每行一个编码前缀，空行和 # 开头的行忽略
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+def format_result(prefix, results):
+    return prefix + ''.join('\t' + word for word, _, _ in results)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Query a generated bangumi.dict.yaml by input code prefix')
+    parser.add_argument('dict', help='dictionary to query (bangumi.dict.yaml)')
+    parser.add_argument('prefixes', nargs='*', help='input code prefixes to look up')
+    parser.add_argument('--batch', default=None,
+                        help='file with one prefix per line; prints "prefix<Tab>word<Tab>word..." per line')
+    parser.add_argument('--against', default=None,
+                        help='second dictionary: print only prefixes whose candidates differ, '
+                             'exit 1 if any do')
+    parser.add_argument('--limit', type=int, default=10, help='candidates per prefix (default: 10, 0 = all)')
+    parser.add_argument('--no-exact-first', action='store_true',
+                        help='rank exact code matches together with longer completions by weight')
+    parser.add_argument('--initials', action='store_true',
+                        help='match prefixes against the syllable initials column written by '
+                             'convert_to_rime_final.py --initials instead of the code')
+    parser.add_argument('--index', default=None,
+                        help='index file (default: <dict>.idx, or <dict>.initials.idx with --initials)')
+    parser.add_argument('--rebuild-index', action='store_true', help='rebuild the index even if it is current')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    limit = args.limit or None
+    exact_first = not args.no_exact_first
+    queries = list(args.prefixes)
+    if args.batch:
+        queries.extend(read_queries(args.batch))
+
+    start = time.perf_counter()
+    index = DictIndex(args.dict, args.index, args.rebuild_index, args.initials)
+    state = 'built' if index.rebuilt else 'loaded'
+    print(f"Index {state} for {len(index)} entries in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+
+    other = DictIndex(args.against, initials=args.initials) if args.against else None
+    start = time.perf_counter()
+    n_diff = 0
+    with index:
+        for prefix in queries:
+            results = index.query(prefix, limit, exact_first)
+            if other is not None:
+                other_results = other.query(prefix, limit, exact_first)
+                if [r[0] for r in results] != [r[0] for r in other_results]:
+                    n_diff += 1
+                    print('-' + format_result(prefix, other_results))
+                    print('+' + format_result(prefix, results))
+            elif args.batch:
+                print(format_result(prefix, results))
+            else:
+                print(f'{prefix}:')
+                for rank, (word, code, weight) in enumerate(results, 1):
+                    print(f'  {rank:>3}  {word}\t{code}\t{weight}')
+    if other is not None:
+        other.close()
+    if queries:
+        seconds = time.perf_counter() - start
+        print(f"{len(queries)} queries in {seconds * 1000:.1f} ms "
+              f"({seconds / len(queries) * 1e6:.0f} us/query)", file=sys.stderr)
+    if other is not None:
+        print(f"{n_diff} of {len(queries)} prefixes differ from {args.against}", file=sys.stderr)
+        return 1 if n_diff else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
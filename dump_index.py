@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import convert_to_rime_final as conv
+
+# 数据文件的行索引（<数据文件>.offsets）：查看各热度层的记录数，按记录 id 直接取出某条记录
+# 以及它给词库贡献的词和原始权重，不必从头扫描几 GB 的文件
+# 索引与 convert_to_rime_final.py --sample 共用，数据文件改动后首次使用时自动重建
+
+def dump_path(base_dir, name):
+    return os.path.join(base_dir, name + '.jsonlines')
+
+def open_index(path, rebuild=False):
+    start = time.perf_counter()
+    index = conv.LineIndex(path, rebuild)
+    state = 'built' if index.rebuilt else 'loaded'
+    print(f"Index {state} for {len(index)} records of {os.path.basename(path)} "
+          f"in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return index
+
+def cmd_stats(args):
+    for name in args.dumps or conv.DUMPS:
+        with open_index(dump_path(args.base_dir, name), args.rebuild_index) as index:
+            print(f"\n{name}: {len(index)} records, {sum(1 for i in index.ids if i < 0)} without id")
+            print(f"{'popularity':<16}{'records':>10}{'share':>9}")
+            for bucket, lines in sorted(index.buckets().items()):
+                print(f"{conv.bucket_label(bucket):<16}{len(lines):>10}{len(lines) / len(index):>9.2%}")
+    return 0
+
+def record_words(dump, data):
+    # 这条记录单独处理时给各输出贡献的 (词, 原始权重)
+    add_record, fields, _ = conv.DUMPS[dump]
+    outputs = tuple({} for _ in conv.DUMPS[dump][2])
+    add_record({key: data[key] for key in fields if key in data}, *outputs)
+    return [sorted(words.items(), key=lambda item: -item[1]) for words in conv.expand_outputs(dump, outputs)]
+
+def cmd_show(args):
+    status = 0
+    with open_index(dump_path(args.base_dir, args.dump), args.rebuild_index) as index:
+        for record_id in args.ids:
+            i = index.find(record_id)
+            if i is None:
+                print(f"{args.dump} {record_id}: not found", file=sys.stderr)
+                status = 1
+                continue
+            try:
+                line = index.line(i)
+                data = json.loads(line)
+            except ValueError as e:
+                print(f"{args.dump} {record_id}: malformed record ({e})", file=sys.stderr)
+                status = 1
+                continue
+            print(f"{args.dump} {record_id} (record {i + 1}, offset {index.offsets[i]}, "
+                  f"popularity {index.popularity[i]}):")
+            print(json.dumps(data, ensure_ascii=False, indent=2) if args.full else line)
+            for column, words in zip(conv.DUMPS[args.dump][2], record_words(args.dump, data)):
+                kind = 'english' if column.get('split') is False else 'chinese'
+                for word, weight in words:
+                    print(f"  {kind}\t{word}\t{weight}")
+    return status
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Line index of the Bangumi jsonlines dumps: '
+                                                 'popularity strata and lookup by record id')
+    parser.add_argument('--base-dir', default='.', help='directory containing the *.jsonlines dumps (default: .)')
+    parser.add_argument('--rebuild-index', action='store_true', help='rebuild the index even if it is current')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    stats = sub.add_parser('stats', help='build or refresh the indexes and count records per popularity stratum')
+    stats.add_argument('dumps', nargs='*', metavar='DUMP', help='character, person or subject (default: all)')
+    stats.set_defaults(func=cmd_stats)
+
+    show = sub.add_parser('show', help='print records by id and the words they contribute')
+    show.add_argument('dump', choices=list(conv.DUMPS), help='character, person or subject')
+    show.add_argument('ids', nargs='+', type=int, help='record ids')
+    show.add_argument('--full', action='store_true', help='pretty-print the whole record')
+    show.set_defaults(func=cmd_show)
+    args = parser.parse_args()
+    # nargs='*' 配 choices 时空列表会被拒绝，这里单独检查
+    unknown = [name for name in getattr(args, 'dumps', []) if name not in conv.DUMPS]
+    if unknown:
+        parser.error(f"unknown dump {unknown[0]!r} (choose from {', '.join(conv.DUMPS)})")
+    return args
+
+def main():
+    args = parse_args()
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
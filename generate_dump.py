@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import random
+
+# 生成与 Bangumi Archive 结构相同的合成数据，用于基准测试
+# 1x 约为 character 20000 条、person 10000 条、subject 20000 条
+
+BASE_COUNTS = {'character': 20000, 'person': 10000, 'subject': 20000}
+
+CN_SURNAMES = list('赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜') + \
+    ['欧阳', '司马', '上官', '诸葛', '东方', '慕容']
+JP_SURNAMES = ['佐藤', '铃木', '高桥', '田中', '渡边', '伊藤', '山本', '中村', '小林', '加藤',
+               '吉田', '山田', '佐佐木', '山口', '松本', '井上', '木村', '林', '清水', '长谷川']
+GIVEN_CHARS = '明华丽美花子雪樱真由香奈凛音羽翔太郎一二三春夏秋冬月星光希爱结衣千代咲琴叶'
+KANA = ('あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん'
+        'がぎぐげござじずぜぞだでどばびぶべぼっゃゅょ'
+        'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモラリルレロンッャュョー')
+LATIN_WORDS = ['Fate', 'Galgame', 'Key', 'ufotable', 'MAPPA', 'SHAFT', 'Vocaloid', 'Love Live',
+               'Production.I.G', 'A-1 Pictures', 'J.C.STAFF', 'Steam', 'Clannad', 'Air', 'Kanon',
+               'Re:Zero', 'Overlord', 'Persona 5', 'Touhou Project', 'Idolmaster']
+ABBREVIATIONS = ['TV', 'OVA', 'OAD', 'PC', 'PS4', 'RPG', 'AVG', 'ACT', 'R18', '3D', 'BGM', 'OST', 'EVA']
+CN_TAGS = ['原创', '漫画改', '小说改', '游戏改', '百合', '搞笑', '日常', '校园', '战斗', '科幻',
+           '治愈', '恋爱', '奇幻', '悬疑', '运动', '音乐', '机战', '后宫', '热血', '致郁']
+SUBJECT_WORDS = ['魔法', '少女', '物语', '战记', '学园', '之旅', '传说', '纪行', '世界', '天空',
+                 '星之', '轨迹', '约定', '终末', '幻想', '乡', '剑', '舞', '恋', '夏日']
+
+def cn_name(rng):
+    surname = rng.choice(JP_SURNAMES if rng.random() < 0.5 else CN_SURNAMES)
+    return surname + ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 3)))
+
+def kana_name(rng):
+    return ''.join(rng.choice(KANA) for _ in range(rng.randint(2, 7)))
+
+def latin_name(rng):
+    return ' '.join(rng.choice(LATIN_WORDS).split()[0] for _ in range(rng.randint(1, 2)))
+
+def title_cn(rng):
+    return ''.join(rng.choice(SUBJECT_WORDS) for _ in range(rng.randint(1, 4)))
+
+def popularity(rng, alpha=1.1):
+    # 长尾分布：多数条目收藏很少，少数极热门
+    return int(rng.paretovariate(alpha)) - 1
+
+def infobox(rng, kind, cn_rate, alias_rate, nickname_rate, title=False):
+    make_name = title_cn if title else cn_name
+    lines = ['{{Infobox ' + kind]
+    if rng.random() < cn_rate:
+        lines.append('|简体中文名= ' + make_name(rng))
+    if rng.random() < alias_rate:
+        items = ['[第二中文名|%s]' % make_name(rng), '[日文名|%s]' % kana_name(rng),
+                 '[罗马字|%s]' % latin_name(rng), '[英文名|%s]' % latin_name(rng)]
+        items += ['[%s]' % make_name(rng) for _ in range(rng.randint(0, 3))]
+        rng.shuffle(items)
+        lines.append('|别名={\r\n' + '\r\n'.join(rng.sample(items, rng.randint(1, len(items)))) + '\r\n}')
+    if rng.random() < nickname_rate:
+        lines.append('|昵称= ' + ''.join('[%s]' % cn_name(rng) for _ in range(rng.randint(1, 2))))
+    lines.append('|性别= ' + rng.choice(['男', '女']))
+    if rng.random() < 0.4:
+        lines.append('|生日= %d月%d日' % (rng.randint(1, 12), rng.randint(1, 28)))
+    if rng.random() < 0.3:
+        lines.append('|引用来源={\r\n[%s]\r\n[官网|http://example.com/%d]\r\n}' % (make_name(rng), rng.randint(1, 9999)))
+    if rng.random() < 0.2:
+        lines.append('|官方网站= http://example.com/?id=%d' % rng.randint(1, 99999))
+    lines.append('}}')
+    return '\r\n'.join(lines)
+
+def character_record(rng, record_id):
+    return {
+        'id': record_id, 'role': rng.choice([1, 1, 1, 2, 3]), 'name': kana_name(rng),
+        'infobox': infobox(rng, 'animanga/Character', 0.7, 0.5, 0.25),
+        'summary': '这是一段角色简介。' * rng.randint(0, 30),
+        'comments': popularity(rng, 1.5), 'collects': popularity(rng),
+    }
+
+def person_record(rng, record_id):
+    return {
+        'id': record_id, 'name': kana_name(rng), 'type': rng.choice([1, 1, 2, 3]),
+        'career': rng.sample(['seiyu', 'producer', 'mangaka', 'artist', 'writer'], rng.randint(1, 2)),
+        'infobox': infobox(rng, 'Person', 0.6, 0.4, 0.15),
+        'summary': '这是一段人物简介。' * rng.randint(0, 20),
+        'comments': popularity(rng, 1.5), 'collects': popularity(rng),
+    }
+
+def subject_record(rng, record_id):
+    tags = []
+    for _ in range(rng.choice([0, 0, 3, 5, 8, 10, 15, 20])):
+        pool = rng.choice([CN_TAGS, LATIN_WORDS, ABBREVIATIONS])
+        tags.append({'name': rng.choice(pool), 'count': popularity(rng, 0.8)})
+    done = popularity(rng, 0.9)
+    data = {
+        'id': record_id, 'type': rng.choice([1, 2, 2, 3, 4, 6]),
+        'name': rng.choice([kana_name(rng), latin_name(rng), rng.choice(ABBREVIATIONS)]),
+        'infobox': infobox(rng, 'animanga/TVAnime', 0.5, 0.4, 0.05, title=True),
+        'platform': rng.randint(0, 6), 'summary': '这是一段作品简介。' * rng.randint(0, 50),
+        'nsfw': rng.random() < 0.05, 'tags': tags,
+        'score': round(min(10.0, max(0.0, rng.gauss(6.5, 1.2))), 1),
+        'rank': rng.randint(0, 20000), 'date': '%d-%02d-01' % (rng.randint(1980, 2025), rng.randint(1, 12)),
+        'favorite': {'wish': popularity(rng), 'done': done, 'doing': popularity(rng),
+                     'on_hold': popularity(rng, 1.5), 'dropped': popularity(rng, 1.5)},
+        'series': rng.random() < 0.2,
+    }
+    if rng.random() < 0.7:
+        data['name_cn'] = rng.choice([title_cn(rng), title_cn(rng), ''])
+    return data
+
+RECORD_MAKERS = {'character': character_record, 'person': person_record, 'subject': subject_record}
+
+def write_side_tables(out_dir, rng, n_names):
+    with open(os.path.join(out_dir, 'names_splitted.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(n_names):
+            name = kana_name(rng)
+            cut = rng.randint(1, len(name))
+            f.write(f'{name}\t{name[:cut]}\t{name[cut:]}\n')
+        for _ in range(n_names // 3):
+            surname = rng.choice(JP_SURNAMES)
+            given = ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 2)))
+            f.write(f'{surname}{given}\t{surname}\t{given}\n')
+    with open(os.path.join(out_dir, 'jp_cn_translations.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(n_names // 2):
+            f.write(f'{kana_name(rng)}\t{cn_name(rng)}\n')
+    with open(os.path.join(out_dir, 'japanese_surnames.txt'), 'w', encoding='utf-8') as f:
+        for surname in JP_SURNAMES:
+            f.write(surname + '\n')
+
+def generate(out_dir, scale=1.0, seed=0):
+    # 返回各数据文件的记录数
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    counts = {}
+    for dump, base in BASE_COUNTS.items():
+        n = max(1, int(base * scale))
+        make_record = RECORD_MAKERS[dump]
+        with open(os.path.join(out_dir, dump + '.jsonlines'), 'w', encoding='utf-8') as f:
+            for i in range(n):
+                f.write(json.dumps(make_record(rng, i + 1), ensure_ascii=False) + '\n')
+        counts[dump] = n
+    write_side_tables(out_dir, rng, max(1, int(3000 * scale)))
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic Bangumi Archive dumps for benchmarking')
+    parser.add_argument('out_dir', help='output directory')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='dataset size relative to 1x (%s)' %
+                             ', '.join(f'{n} {dump}' for dump, n in BASE_COUNTS.items()))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.out_dir, args.scale, args.seed)
+    for dump, n in counts.items():
+        print(f'{dump}.jsonlines: {n} records')
+    print(f'Output saved to: {args.out_dir}')
+
+if __name__ == '__main__':
+    main()
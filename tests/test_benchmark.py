@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import convert_to_rime_final as conv
+import generate_dump
+
+def test_benchmark_uses_generated_side_tables(tmp_path):
+    generate_dump.generate(str(tmp_path), scale=0.02, seed=0)
+    try:
+        tables = benchmark.load_data_tables(str(tmp_path))
+        assert tables.jp_surnames
+        assert tables.split_names
+        assert tables.jp_cn_translations
+        assert conv.side_tables() is tables
+    finally:
+        # 下次使用时重新读入脚本目录下的附加数据表
+        conv.replace_side_tables(None)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dict_delta
+
+HEADER = '---\nname: bangumi\nversion: "1"\nsort: by_weight\n...\n\n'
+
+def write(path, body):
+    path.write_text(HEADER + body, encoding='utf-8')
+    return dict_delta.DictFile(str(path))
+
+def test_entries_parsed_by_field_count(tmp_path):
+    old = write(tmp_path / 'old.dict.yaml', '猫羽雫\tmaoyuna\n甲乙\tjiayi\t10\nGalgame\tgalgame\t5\n')
+    new = write(tmp_path / 'new.dict.yaml',
+                '猫羽雫\tmao yu na\t3\tmyn\n甲乙\tjiayi\t12\n# 注释\n丙\tbing\n')
+    assert old.entries == {'猫羽雫\tmaoyuna'.encode(): b'0',
+                           '甲乙\tjiayi'.encode(): b'10', b'Galgame\tgalgame': b'5'}
+    assert new.entries['猫羽雫\tmao yu na'.encode()] == b'3'
+    added, removed, reweighted = dict_delta.diff_entries(old, new)
+    assert sorted(added) == [('丙\tbing'.encode(), 0), ('猫羽雫\tmao yu na'.encode(), 3)]
+    assert sorted(removed) == [(b'Galgame\tgalgame', 5), ('猫羽雫\tmaoyuna'.encode(), 0)]
+    assert reweighted == [('甲乙\tjiayi'.encode(), 10, 12)]
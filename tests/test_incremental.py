@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_rime_final as conv
+
+def record(record_id, name, collects=3):
+    infobox = '{{Infobox animanga/Character\r\n|简体中文名= ' + name + '\r\n}}'
+    data = {'collects': collects, 'infobox': infobox}
+    if record_id is not None:
+        data = {'id': record_id, **data}
+    return json.dumps(data, ensure_ascii=False)
+
+def write(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+def test_repeated_lines_match_full_build(tmp_path):
+    path = tmp_path / 'character.jsonlines'
+    lines = [record(1, '甲乙丙')] * 3 + [record(None, '丁戊己')] * 2 + [record(2, '庚辛')]
+    write(path, lines)
+    full = conv.aggregate_jsonlines('character', str(path))
+    outputs, records, stats = conv.process_jsonlines_incremental('character', str(path), {})
+    assert outputs == full
+    assert len(records) == len(lines)
+    assert stats['added'] == len(lines)
+
+    # 改动其中一份重复记录后，增量结果仍与全量构建一致
+    lines[1] = record(1, '甲乙丙', collects=40)
+    write(path, lines)
+    outputs, _, stats = conv.process_jsonlines_incremental('character', str(path), records)
+    assert outputs == conv.aggregate_jsonlines('character', str(path))
+    assert stats == {'added': 0, 'changed': 1, 'removed': 0, 'unchanged': len(lines) - 1}
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_rime_final as conv
+
+BOX = ('{{Infobox animanga/Character\r\n| 简体中文名= 甲乙丙\r\n|中文别名={\r\n[丁戊]\r\n[英文名|Foo]\r\n'
+       '[第二中文名|己庚]\r\n}\r\n| 昵称 = [小甲][阿丙]\r\n|性别= 女\r\n}}')
+
+def test_leading_space_before_key():
+    assert conv.parse_infobox(BOX)['简体中文名'] == '甲乙丙'
+    assert conv.parse_infobox(BOX, conv.INFOBOX_KEYS)['简体中文名'] == '甲乙丙'
+    assert conv.extract_chinese_name(BOX) == '甲乙丙'
+
+def test_alias_keys_match_by_suffix():
+    fields = conv.parse_infobox(BOX, conv.INFOBOX_KEYS)
+    assert fields['别名'] == ['丁戊', '英文名|Foo', '第二中文名|己庚']
+    assert '性别' not in fields
+    assert conv.extract_aliases(BOX) == ['丁戊']
+    assert conv.extract_nickname(BOX) == ['小甲', '阿丙']
+
+def test_alias_list_preferred_over_earlier_scalar():
+    box = '{{Infobox\r\n|中文别名= 单行\r\n|别名={\r\n[丁戊]\r\n[庚辛]\r\n}\r\n|日文别名={\r\n[壬癸]\r\n}\r\n}}'
+    assert conv.parse_infobox(box, conv.INFOBOX_KEYS)['别名'] == ['丁戊', '庚辛']
+    assert conv.extract_aliases(box) == ['丁戊', '庚辛']
+    assert conv.parse_infobox('{{Infobox\r\n|中文别名= 单行\r\n}}', conv.INFOBOX_KEYS)['别名'] == '单行'
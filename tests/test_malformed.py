@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_rime_final as conv
+
+def record(record_id, name):
+    infobox = '{{Infobox animanga/Character\r\n|简体中文名= ' + name + '\r\n}}'
+    return json.dumps({'id': record_id, 'collects': 3, 'infobox': infobox}, ensure_ascii=False).encode('utf-8')
+
+LINES = [record(1, '甲乙丙'), b'{"id": 2, "infobox": "\xff\xfe"}', record(3, '丁戊己')]
+
+@pytest.fixture(params=sorted(conv.JSON_BACKENDS))
+def backend(request):
+    conv.set_json_backend(request.param)
+    conv.MALFORMED_LINES.clear()
+    yield request.param
+    conv.set_json_backend('auto')
+    conv.MALFORMED_LINES.clear()
+
+def test_invalid_utf8_line_is_counted(tmp_path, backend):
+    path = tmp_path / 'character.jsonlines'
+    path.write_bytes(b'\n'.join(LINES) + b'\n')
+    names, = conv.aggregate_jsonlines('character', str(path))
+    assert set(names) == {'甲乙丙', '丁戊己'}
+    assert conv.MALFORMED_LINES == {'character.jsonlines': 1}
+
+def test_invalid_utf8_line_in_archive_is_counted(tmp_path, backend):
+    archive = tmp_path / 'dump.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('character.jsonlines', b'\n'.join(LINES) + b'\n')
+    names, = conv.aggregate_jsonlines('character', str(archive), member='character.jsonlines')
+    assert set(names) == {'甲乙丙', '丁戊己'}
+    assert conv.MALFORMED_LINES == {'character.jsonlines': 1}
+
+def test_invalid_utf8_line_incremental_and_sample(tmp_path, backend):
+    path = tmp_path / 'character.jsonlines'
+    path.write_bytes(b'\n'.join(LINES) + b'\n')
+    (names,), _, _ = conv.process_jsonlines_incremental('character', str(path), {})
+    assert set(names) == {'甲乙丙', '丁戊己'}
+    names, = conv.sample_jsonlines('character', str(path), 1.0)
+    assert set(names) == {'甲乙丙', '丁戊己'}
+    assert conv.MALFORMED_LINES == {'character.jsonlines': 2}
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_rime_final as conv
+
+def test_romanize_many_keeps_alignment_with_newlines():
+    assert conv.romanize_many(['A\nB', 'カ', 'しゃ\nー', 'きょう']) == ['A\nB', 'ka', 'sha\n', 'kyou']
+    assert conv.romanize_many([]) == []
+    assert conv.kana_to_romaji('カ\nナ') == 'ka\nna'
+
+def test_romanize_many_matches_single_conversion():
+    texts = ['さくら', 'ちゃっと', 'ラーメン', '']
+    assert conv.romanize_many(texts) == [conv.kana_to_romaji(text) for text in texts]
+
+def test_kana_to_roma_keeps_sokuon_and_choon():
+    assert conv.KANA_TO_ROMA['っ'] == ''
+    assert conv.KANA_TO_ROMA['ッ'] == ''
+    assert conv.KANA_TO_ROMA['ー'] == '-'
+    assert conv.KANA_TO_ROMA['か'] == conv.KANA_TO_ROMA['カ'] == 'ka'
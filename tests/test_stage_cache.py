@@ -0,0 +1,39 @@
+import inspect
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import convert_to_rime_final as conv
+
+# 不影响 ingest 产物的代码：性能统计，以及与 --stage-cache 互斥的 --sample
+NOT_INGEST = {'ProfileStage', 'profile_stage', 'peak_rss_mb', 'count_lines', 'dump_size', 'sample_jsonlines',
+              'LineIndex', 'record_popularity', 'popularity_bucket', 'bucket_label'}
+
+def referenced(roots):
+    # 从 roots 出发，收集本模块中被调用到的函数和类
+    seen = set()
+    todo = list(roots)
+    while todo:
+        name = todo.pop()
+        if name in seen or name in NOT_INGEST:
+            continue
+        seen.add(name)
+        obj = getattr(conv, name)
+        if inspect.isclass(obj):
+            codes = [f.__code__ for f in vars(obj).values() if inspect.isfunction(f)]
+        else:
+            codes = [obj.__code__]
+        while codes:
+            code = codes.pop()
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+            for ref in code.co_names:
+                value = getattr(conv, ref, None)
+                if (inspect.isfunction(value) or inspect.isclass(value)) and value.__module__ == conv.__name__:
+                    todo.append(ref)
+    return seen
+
+def test_ingest_fingerprint_covers_called_code():
+    roots = ['read_dump'] + [add_record.__name__ for add_record, _, _ in conv.DUMPS.values()]
+    covered = set(conv.STAGE_CODE['ingest']) | {add_record.__name__ for add_record, _, _ in conv.DUMPS.values()}
+    assert referenced(roots) - covered == set()
@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import convert_to_rime_final as conv
+
+# 权重调参：合并后的原始权重只读一次，放进 NumPy 数组
+# 每组候选规则对所有词条向量化地换算，与当前规则比较排名变化、各权重段条数和前 N 名的变化
+
+# 权重段的下界
+WEIGHT_BUCKETS = [1, 10, 30, 100, 300, 1000, 3000, 10000]
+DEFAULT_TOP = 100
+# english_weight_class 的结果 -> 除数数组的下标
+ENGLISH_CLASSES = (None, 'abbreviation', 'caps', 'alnum')
+
+def load_table(base_dir, archive=None, cache_dir=None):
+    # 复用 --stage-cache 的产物；缺少时读取数据文件建表，并写入缓存供下次使用
+    tables = conv.side_tables()
+    cache = conv.StageCache(cache_dir or os.path.join(base_dir, 'stage_cache'))
+    ingest_keys = {name: cache.key('ingest:' + name, conv.dump_source(name, base_dir, archive))
+                   for name in conv.DUMPS}
+    table = cache.load(cache.key('merge', conv.merge_inputs(cache, ingest_keys, tables)))
+    if table is not None:
+        return table
+
+    def read(name):
+        outputs = cache.load(ingest_keys[name])
+        if outputs is None:
+            outputs = conv.read_dump(name, base_dir, archive)
+            cache.store(ingest_keys[name], outputs)
+        return outputs
+
+    table = conv.build_weight_table(read, tables)
+    cache.store(cache.key('merge', conv.merge_inputs(cache, ingest_keys, tables)), table)
+    return table
+
+class WeightArrays:
+    # 词条顺序与 iter_dict_entries 相同：中文词、英文词、假名人名、假名、日本汉字
+    # merge_english 与 convert_to_rime_final.py --merge-english 相同，先合并英文写法变体
+    def __init__(self, table, n_kana_names, merge_english=False):
+        words = []
+        raw = []
+        for word, weight in table.totals(conv.CHINESE_COLUMNS):
+            if word:
+                words.append(word)
+                raw.append(weight)
+        n_chinese = len(words)
+        english_class = []
+        latin_start = []
+        english = table.totals(conv.ENGLISH_COLUMNS)
+        if merge_english:
+            english = conv.merge_english_variants([(word, weight) for word, weight in english if word])[0]
+        for word, weight in english:
+            if word:
+                words.append(word)
+                raw.append(weight)
+                english_class.append(ENGLISH_CLASSES.index(conv.english_weight_class(word)))
+                latin_start.append(bool(conv.LATIN_START_RE.match(word)))
+
+        self.words = words
+        self.raw = np.array(raw, dtype=np.int64)
+        self.n_chinese = n_chinese
+        self.english_class = np.array(english_class, dtype=np.int64)
+        self.latin_start = np.array(latin_start, dtype=bool)
+        self.n_kana_names = n_kana_names
+        fixed = conv.KANA_ENTRIES + conv.JP_KANJI_POLYPHONIC
+        self.words += ['<kana name>'] * n_kana_names + [word for word, _, _ in fixed]
+        self.fixed = np.array([weight for _, _, weight in fixed], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.words)
+
+    def evaluate(self, config):
+        # 返回 (换算后的权重, 是否收录)，与真实构建逐条一致
+        raw = self.raw.copy()
+        divisors = np.array([1] + [config['english_divisors'][name] for name in ENGLISH_CLASSES[1:]],
+                            dtype=np.int64)
+        raw[self.n_chinese:] //= divisors[self.english_class]
+
+        conditions = [raw > threshold for threshold, _ in config['scale_breakpoints']]
+        choices = [raw // divisor for _, divisor in config['scale_breakpoints']]
+        scaled = np.select(conditions, choices, default=np.maximum(raw, 1)) if conditions else np.maximum(raw, 1)
+
+        keep = np.ones(len(self.words), dtype=bool)
+        english = slice(self.n_chinese, len(raw))
+        keep[english] = ~(self.latin_start & (scaled[english] < config['english_threshold']))
+        weights = np.concatenate([scaled, np.full(self.n_kana_names, config['kana_name_weight'], dtype=np.int64),
+                                  self.fixed])
+        return weights, keep
+
+    def ranking(self, config):
+        # 返回 (输出顺序的词条下标, 每个词条的排名，未收录为 -1, 权重)
+        weights, keep = self.evaluate(config)
+        kept = np.flatnonzero(keep)
+        # 稳定排序：同权重保持加入顺序，与写出的词库一致
+        order = kept[np.argsort(-weights[kept], kind='stable')]
+        ranks = np.full(len(weights), -1, dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        return order, ranks, weights
+
+def compare(arrays, base, candidate, top):
+    base_order, base_ranks, _ = base
+    order, ranks, weights = candidate
+    both = (base_ranks >= 0) & (ranks >= 0)
+    shift = np.abs(ranks[both] - base_ranks[both])
+    kept_weights = weights[order]
+    edges = WEIGHT_BUCKETS + [np.iinfo(np.int64).max]
+    counts = np.histogram(kept_weights, bins=edges)[0]
+    base_top = set(base_order[:top].tolist())
+    new_top = set(order[:top].tolist())
+    return {
+        'entries': int(len(order)),
+        'added': int(((base_ranks < 0) & (ranks >= 0)).sum()),
+        'removed': int(((base_ranks >= 0) & (ranks < 0)).sum()),
+        'moved': int((shift > 0).sum()),
+        'median_shift': float(np.median(shift)) if len(shift) else 0.0,
+        'p90_shift': float(np.percentile(shift, 90)) if len(shift) else 0.0,
+        'max_shift': int(shift.max()) if len(shift) else 0,
+        'buckets': {f'>={low}': int(n) for low, n in zip(WEIGHT_BUCKETS, counts)},
+        'top_entered': [arrays.words[i] for i in order[:top].tolist() if i not in base_top],
+        'top_left': [arrays.words[i] for i in base_order[:top].tolist() if i not in new_top],
+    }
+
+def load_candidates(path, base_config):
+    # {"名称": {部分规则}, ...}，未给出的规则沿用基准
+    with open(path, 'r', encoding='utf-8') as f:
+        candidates = json.load(f)
+    if not isinstance(candidates, dict):
+        raise ValueError('candidates file must be a JSON object of name -> weight settings')
+    configs = {}
+    for name, settings in candidates.items():
+        merged = dict(base_config)
+        merged.update(settings)
+        configs[name] = conv.check_weight_config(merged)
+    return configs
+
+def print_report(results, top):
+    print(f"\n{'candidate':<20}{'entries':>9}{'+/-':>13}{'moved':>9}{'median':>8}{'p90':>8}"
+          f"{'max':>9}{f'top{top} in/out':>14}{'ms':>8}")
+    for name, r in results.items():
+        delta = f"+{r['added']}/-{r['removed']}"
+        churn = f"{len(r['top_entered'])}/{len(r['top_left'])}"
+        print(f"{name:<20}{r['entries']:>9}{delta:>13}{r['moved']:>9}{r['median_shift']:>8.0f}"
+              f"{r['p90_shift']:>8.0f}{r['max_shift']:>9}{churn:>14}{r['ms']:>8.1f}")
+
+    print(f"\n{'candidate':<20}" + ''.join(f'{label:>9}' for label in next(iter(results.values()))['buckets']))
+    for name, r in results.items():
+        print(f'{name:<20}' + ''.join(f'{n:>9}' for n in r['buckets'].values()))
+
+    for name, r in results.items():
+        if r['top_entered'] or r['top_left']:
+            print(f"\n{name}: top {top} gained " + ' '.join(r['top_entered'][:15])
+                  + f"\n{' ' * len(name)}  top {top} lost   " + ' '.join(r['top_left'][:15]))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Try weight rules for convert_to_rime_final.py on cached aggregates')
+    parser.add_argument('--base-dir', required=True, help='data directory, as for convert_to_rime_final.py')
+    parser.add_argument('--archive', default=None, help='Bangumi Archive zip, as for convert_to_rime_final.py')
+    parser.add_argument('--cache-dir', default=None, help='stage cache directory (default: <base-dir>/stage_cache)')
+    parser.add_argument('--weight-config', default=None, help='baseline weight rules (default: the built-in rules)')
+    parser.add_argument('--merge-english', action='store_true',
+                        help='merge English spelling variants first, as convert_to_rime_final.py --merge-english')
+    parser.add_argument('--candidates', required=True,
+                        help='JSON object of candidate name -> weight settings that differ from the baseline')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP,
+                        help=f'size of the top list to compare (default: {DEFAULT_TOP})')
+    parser.add_argument('--report', default=None, help='also write the comparison as JSON')
+    parser.add_argument('--export', default=None, metavar='NAME',
+                        help='write the full rules of this candidate for convert_to_rime_final.py --weight-config')
+    parser.add_argument('--output', default='weight_config.json',
+                        help='file for --export (default: weight_config.json)')
+    return parser.parse_args()
+
+def main():
+    if np is None:
+        print('tune_weights.py needs NumPy: pip install numpy', file=sys.stderr)
+        return 1
+    args = parse_args()
+    try:
+        if args.weight_config:
+            conv.load_weight_config(args.weight_config)
+        base_config = conv.weight_config()
+        configs = load_candidates(args.candidates, base_config)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.export and args.export not in configs:
+        print(f'--export: no candidate named {args.export}', file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    table = load_table(args.base_dir, args.archive, args.cache_dir)
+    kana_names = conv.load_kana_names(os.path.join(args.base_dir, 'names_splitted.txt'))
+    arrays = WeightArrays(table, len(kana_names), args.merge_english)
+    del table, kana_names
+    print(f"Loaded {len(arrays)} entries in {time.perf_counter() - start:.2f}s")
+
+    base = arrays.ranking(base_config)
+    results = {}
+    for name, config in {'baseline': base_config, **configs}.items():
+        start = time.perf_counter()
+        candidate = base if name == 'baseline' else arrays.ranking(config)
+        result = compare(arrays, base, candidate, args.top)
+        result['ms'] = (time.perf_counter() - start) * 1000
+        result['config'] = config
+        results[name] = result
+    print_report(results, args.top)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nReport saved to: {args.report}")
+    if args.export:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(configs[args.export], f, indent=2)
+        print(f"\nExported {args.export} to {args.output}; build with "
+              f"python convert_to_rime_final.py --weight-config {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())